@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from .config import BATCH_CHUNK_SIZE, BATCH_CONCURRENCY, TOP_K
+from .extractive import extract_answer
+from .llm import LLMClient, LLMError
+from .rerank import retrieve_many
+from .scheduling import scheduler
+from .vectorstore import VectorStore
+
+
+NOT_AVAILABLE = "The information is not available in the provided documents."
+
+
+def _doc_filter(doc_ids: Optional[List[str]]) -> Optional[Dict[str, Any]]:
+    if not doc_ids:
+        return None
+    return {"doc_id": {"$in": list(doc_ids)}}
+
+
+def chunk_citations(metadatas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "doc_name": meta.get("doc_name", ""),
+            "chunk_id": meta.get("chunk_id", ""),
+            "source_link": meta.get("source_link") or None,
+        }
+        for meta in metadatas
+    ]
+
+
+async def answer_batch(
+    questions: List[str],
+    doc_ids: Optional[List[str]] = None,
+    top_k: int = TOP_K,
+    concurrency: int = BATCH_CONCURRENCY,
+    shards: Optional[List[str]] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    unique = list(dict.fromkeys(questions))
+    positions: Dict[str, List[int]] = {}
+    for index, question in enumerate(questions):
+        positions.setdefault(question, []).append(index)
+
+    vectorstore = VectorStore()
+    llm = LLMClient()
+    chunk_text: Dict[str, str] = {}
+    contexts: Dict[Tuple[str, ...], str] = {}
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(question: str, key: Tuple[str, ...], metadatas: List[Dict[str, Any]]) -> Tuple[str, Dict[str, Any]]:
+        if not key:
+            answer = NOT_AVAILABLE
+        elif llm.available():
+            try:
+                async with semaphore:
+                    result = await asyncio.to_thread(llm.answer_with_context, question, contexts[key])
+            except LLMError as exc:
+                return question, {"answer": None, "error": str(exc), "citations": chunk_citations(metadatas)}
+            answer = result.answer or NOT_AVAILABLE
+        else:
+            documents = [chunk_text[chunk_id] for chunk_id in key]
+            extracted = await scheduler.run("batch", extract_answer, question, documents, metadatas)
+            if extracted:
+                return question, extracted
+            answer = documents[0]
+        return question, {"answer": answer, "citations": chunk_citations(metadatas)}
+
+    step = max(1, BATCH_CHUNK_SIZE)
+    for offset in range(0, len(unique), step):
+        part = unique[offset : offset + step]
+        results = await scheduler.run("batch", retrieve_many, part, vectorstore, top_k, None, _doc_filter(doc_ids), shards)
+
+        plans = []
+        for question, result in zip(part, results):
+            ids = result.get("ids", [[]])[0]
+            documents = result.get("documents", [[]])[0]
+            metadatas = result.get("metadatas", [[]])[0]
+            order: List[str] = []
+            for chunk_id, text in zip(ids, documents):
+                chunk_text.setdefault(chunk_id, text)
+                if chunk_id not in order:
+                    order.append(chunk_id)
+            key = tuple(order)
+            if key not in contexts:
+                contexts[key] = "\n\n".join(chunk_text[chunk_id] for chunk_id in order)
+            plans.append((question, key, metadatas))
+
+        tasks = [asyncio.create_task(run(question, key, metadatas)) for question, key, metadatas in plans]
+        try:
+            for completed in asyncio.as_completed(tasks):
+                question, payload = await completed
+                for index in positions[question]:
+                    yield {"index": index, "question": question, **payload}
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+def run_batch(
+    questions: List[str],
+    doc_ids: Optional[List[str]] = None,
+    top_k: int = TOP_K,
+    concurrency: int = BATCH_CONCURRENCY,
+    shards: Optional[List[str]] = None,
+) -> List[Dict[str, Any]]:
+    async def collect() -> List[Dict[str, Any]]:
+        return [item async for item in answer_batch(questions, doc_ids, top_k, concurrency, shards)]
+
+    return sorted(asyncio.run(collect()), key=lambda item: item["index"])
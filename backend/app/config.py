@@ -11,6 +11,8 @@ DATA_DIR = PROJECT_DIR / "data"
 UPLOAD_DIR = DATA_DIR / "uploads"
 REPORT_DIR = DATA_DIR / "reports"
 CHROMA_DIR = DATA_DIR / "chroma"
+TABLE_DIR = DATA_DIR / "tables"
+SNAPSHOT_DIR = DATA_DIR / "snapshots"
 DOC_STORE = DATA_DIR / "docs.json"
 SESSION_DB = DATA_DIR / "sessions.db"
 
@@ -18,12 +20,26 @@ LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai").strip().lower()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "").strip()
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "").strip() or None
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "").strip()
 GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
 GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1")
 
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+LLM_HEDGE_AFTER = float(os.getenv("LLM_HEDGE_AFTER", "0"))
+LLM_RATE_LIMIT_WAIT = float(os.getenv("LLM_RATE_LIMIT_WAIT", "60"))
+LLM_FAILOVER = os.getenv("LLM_FAILOVER", "true").strip().lower() in {"1", "true", "yes"}
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "20"))
+GROQ_RPM = int(os.getenv("GROQ_RPM", "30"))
+GROQ_TPM = int(os.getenv("GROQ_TPM", "6000"))
+OPENAI_RPM = int(os.getenv("OPENAI_RPM", "0"))
+OPENAI_TPM = int(os.getenv("OPENAI_TPM", "0"))
+
 GOOGLE_DRIVE_FOLDER_URL = os.getenv("GOOGLE_DRIVE_FOLDER_URL", "")
 GOOGLE_DRIVE_FOLDER_ID = os.getenv("GOOGLE_DRIVE_FOLDER_ID", "")
 GOOGLE_DRIVE_SERVICE_ACCOUNT_JSON = os.getenv("GOOGLE_DRIVE_SERVICE_ACCOUNT_JSON", "")
@@ -33,7 +49,45 @@ CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "150"))
 TOP_K = int(os.getenv("TOP_K", "4"))
 MAX_HISTORY = int(os.getenv("MAX_HISTORY", "6"))
 
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").strip().lower() in {"1", "true", "yes"}
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "32"))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "4096"))
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "1000"))
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "256"))
+
+WORKER_SLOTS = int(os.getenv("WORKER_SLOTS", str(os.cpu_count() or 4)))
+INTERACTIVE_RESERVED_SLOTS = int(os.getenv("INTERACTIVE_RESERVED_SLOTS", "1"))
+CHAT_CONCURRENCY = int(os.getenv("CHAT_CONCURRENCY", "8"))
+CHAT_QUEUE = int(os.getenv("CHAT_QUEUE", "64"))
+BATCH_LANE_CONCURRENCY = int(os.getenv("BATCH_LANE_CONCURRENCY", "2"))
+BATCH_QUEUE = int(os.getenv("BATCH_QUEUE", "4"))
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "2"))
+UPLOAD_QUEUE = int(os.getenv("UPLOAD_QUEUE", "16"))
+REPORT_CONCURRENCY = int(os.getenv("REPORT_CONCURRENCY", "2"))
+REPORT_QUEUE = int(os.getenv("REPORT_QUEUE", "8"))
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "").strip()
+SNAPSHOT_BATCH_SIZE = int(os.getenv("SNAPSHOT_BATCH_SIZE", "1000"))
+
+PROFILE_ENABLED = os.getenv("PROFILE_ENABLED", "false").strip().lower() in {"1", "true", "yes"}
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0.01"))
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "2000"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "10"))
+PROFILE_RING_SIZE = int(os.getenv("PROFILE_RING_SIZE", "50"))
+PROFILE_BUFFER_SAMPLES = int(os.getenv("PROFILE_BUFFER_SAMPLES", "50000"))
+
+EXTRACTIVE_SPANS = int(os.getenv("EXTRACTIVE_SPANS", "2"))
+EXTRACTIVE_MAX_SENTENCES = int(os.getenv("EXTRACTIVE_MAX_SENTENCES", "256"))
+EXTRACTIVE_MIN_SCORE = float(os.getenv("EXTRACTIVE_MIN_SCORE", "0.2"))
+
+REPORT_TABLE_ROWS = int(os.getenv("REPORT_TABLE_ROWS", "200"))
+REPORT_SUMMARY_CHARS = int(os.getenv("REPORT_SUMMARY_CHARS", "20000"))
+
 
 def ensure_dirs() -> None:
-    for path in [DATA_DIR, UPLOAD_DIR, REPORT_DIR, CHROMA_DIR]:
+    for path in [DATA_DIR, UPLOAD_DIR, REPORT_DIR, CHROMA_DIR, TABLE_DIR, SNAPSHOT_DIR]:
         path.mkdir(parents=True, exist_ok=True)
@@ -19,6 +19,10 @@ def _folder_id_from_url(url: str) -> str:
     return ""
 
 
+def configured_folder_id() -> str:
+    return GOOGLE_DRIVE_FOLDER_ID or _folder_id_from_url(GOOGLE_DRIVE_FOLDER_URL)
+
+
 def download_public_folder(target_dir: Path) -> List[Dict[str, str]]:
     folder_url = GOOGLE_DRIVE_FOLDER_URL
     if not folder_url:
@@ -41,7 +45,7 @@ def download_with_service_account(target_dir: Path) -> List[Dict[str, str]]:
     )
     service = build("drive", "v3", credentials=credentials)
 
-    folder_id = GOOGLE_DRIVE_FOLDER_ID or _folder_id_from_url(GOOGLE_DRIVE_FOLDER_URL)
+    folder_id = configured_folder_id()
     if not folder_id:
         return []
 
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .config import EXTRACTIVE_MAX_SENTENCES, EXTRACTIVE_MIN_SCORE, EXTRACTIVE_SPANS
+from .llm import get_local_encoder
+
+
+BOUNDARY_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+MIN_SENTENCE_CHARS = 12
+
+
+def split_sentences(text: str) -> List[Tuple[int, int]]:
+    spans: List[Tuple[int, int]] = []
+    bounds = [(0, 0)] + [match.span() for match in BOUNDARY_RE.finditer(text)] + [(len(text), len(text))]
+    for (_, start), (end, _) in zip(bounds, bounds[1:]):
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if end - start >= MIN_SENTENCE_CHARS:
+            spans.append((start, end))
+    return spans
+
+
+def extract_answer(
+    question: str,
+    documents: List[str],
+    metadatas: List[Dict[str, Any]],
+    max_spans: int = EXTRACTIVE_SPANS,
+) -> Optional[Dict[str, Any]]:
+    candidates: List[Tuple[int, int, int]] = []
+    for doc_idx, text in enumerate(documents):
+        for start, end in split_sentences(text):
+            candidates.append((doc_idx, start, end))
+            if len(candidates) >= EXTRACTIVE_MAX_SENTENCES:
+                break
+        if len(candidates) >= EXTRACTIVE_MAX_SENTENCES:
+            break
+    if not candidates:
+        return None
+
+    sentences = [documents[doc_idx][start:end] for doc_idx, start, end in candidates]
+    vectors = get_local_encoder().encode(
+        [question] + sentences,
+        batch_size=64,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+        show_progress_bar=False,
+    )
+    scores = vectors[1:] @ vectors[0]
+    order = np.argsort(-scores)[:max_spans]
+    order = [idx for idx in order.tolist() if scores[idx] >= EXTRACTIVE_MIN_SCORE] or order[:1].tolist()
+
+    citations = []
+    for idx in order:
+        doc_idx, start, end = candidates[idx]
+        meta = metadatas[doc_idx] if doc_idx < len(metadatas) else {}
+        citations.append(
+            {
+                "doc_name": meta.get("doc_name", ""),
+                "chunk_id": meta.get("chunk_id", ""),
+                "source_link": meta.get("source_link") or None,
+                "start": start,
+                "end": end,
+            }
+        )
+    return {"answer": " ".join(sentences[idx] for idx in order), "citations": citations}
@@ -13,7 +13,8 @@ from docx import Document
 
 from .config import UPLOAD_DIR
 from .storage import add_doc
-from .utils import chunk_text, safe_filename
+from .tables import store_tables
+from .utils import chunk_text, normalize_shard, safe_filename
 
 
 def _table_to_text(table: List[List[str]]) -> str:
@@ -69,6 +70,7 @@ def ingest_file(
     filename: str,
     source: str,
     source_link: str | None = None,
+    shard: str | None = None,
 ) -> Dict[str, object]:
     safe_name = safe_filename(filename)
     doc_id = uuid.uuid4().hex
@@ -95,23 +97,40 @@ def ingest_file(
             text = ""
 
     chunks = chunk_text(text)
+    table_chunks = []
     for table in tables:
         if table.strip():
+            table_chunks.append((f"{doc_id}_{len(chunks)}", table))
             chunks.append(table)
+    if table_chunks:
+        store_tables(doc_id, table_chunks)
     doc_meta = {
         "id": doc_id,
         "name": filename,
         "path": str(saved_path),
         "source": source,
         "source_link": source_link,
+        "shard": normalize_shard(shard),
         "chunks": len(chunks),
         "tables": tables,
     }
     add_doc(doc_meta)
-    return {"id": doc_id, "name": filename, "chunks": len(chunks), "chunk_text": chunks}
+    return {
+        "id": doc_id,
+        "name": filename,
+        "shard": doc_meta["shard"],
+        "chunks": len(chunks),
+        "chunk_text": chunks,
+    }
 
 
-def build_chunk_payload(doc_id: str, doc_name: str, source_link: str | None, chunks: List[str]) -> Tuple[List[str], List[Dict[str, str]], List[str]]:
+def build_chunk_payload(
+    doc_id: str,
+    doc_name: str,
+    source_link: str | None,
+    chunks: List[str],
+    shard: str | None = None,
+) -> Tuple[List[str], List[Dict[str, str]], List[str]]:
     ids = []
     metadatas = []
     for idx, chunk in enumerate(chunks):
@@ -123,6 +142,7 @@ def build_chunk_payload(doc_id: str, doc_name: str, source_link: str | None, chu
                 "doc_name": doc_name,
                 "chunk_id": chunk_id,
                 "source_link": source_link or "",
+                "shard": normalize_shard(shard),
             }
         )
     return chunks, metadatas, ids
@@ -1,21 +1,55 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
 import json
-from typing import Any, Dict, List, Optional
+import random
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Deque, Dict, List, Optional
 
+import httpx
+import openai
 from openai import OpenAI
-from sentence_transformers import SentenceTransformer
 
 from .config import (
     EMBEDDING_MODEL,
     GROQ_API_KEY,
     GROQ_BASE_URL,
     GROQ_MODEL,
+    GROQ_RPM,
+    GROQ_TPM,
+    LLM_FAILOVER,
+    LLM_HEDGE_AFTER,
+    LLM_MAX_RETRIES,
+    LLM_POOL_SIZE,
     LLM_PROVIDER,
+    LLM_RATE_LIMIT_WAIT,
+    LLM_RETRY_BASE_DELAY,
+    LLM_RETRY_MAX_DELAY,
+    LLM_TIMEOUT,
     OPENAI_API_KEY,
+    OPENAI_BASE_URL,
     OPENAI_MODEL,
+    OPENAI_RPM,
+    OPENAI_TPM,
 )
+from .scheduling import ProviderLimiter
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMError(RuntimeError):
+    pass
+
+
+class ProviderBusy(LLMError):
+    pass
 
 
 @dataclass
@@ -23,87 +57,300 @@ class LLMResult:
     answer: str
 
 
+@dataclass
+class Provider:
+    name: str
+    client: OpenAI
+    model: str
+    limiter: ProviderLimiter
+
+
+@dataclass
+class ProviderMetrics:
+    requests: int = 0
+    errors: int = 0
+    retries: int = 0
+    hedges: int = 0
+    failovers: int = 0
+    throttled: int = 0
+    latencies_ms: Deque[float] = field(default_factory=lambda: deque(maxlen=512))
+
+    def snapshot(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies_ms)
+
+        def pct(value: float) -> float:
+            if not latencies:
+                return 0.0
+            return round(latencies[min(len(latencies) - 1, int(value * len(latencies)))], 1)
+
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "failovers": self.failovers,
+            "throttled": self.throttled,
+            "latency_p50_ms": pct(0.5),
+            "latency_p99_ms": pct(0.99),
+        }
+
+
+_http_client: httpx.Client | None = None
+_http_lock = threading.Lock()
+
+
+def shared_http_client() -> httpx.Client:
+    global _http_client
+    with _http_lock:
+        if _http_client is None:
+            _http_client = httpx.Client(
+                timeout=LLM_TIMEOUT,
+                limits=httpx.Limits(max_connections=LLM_POOL_SIZE, max_keepalive_connections=LLM_POOL_SIZE),
+            )
+        return _http_client
+
+
+def _is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code in RETRYABLE_STATUS
+    return False
+
+
+def _retry_after(exc: Exception) -> float | None:
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        return None
+    return None
+
+
+def _estimate_tokens(kwargs: Dict[str, Any]) -> int:
+    chars = sum(len(message.get("content") or "") for message in kwargs.get("messages", []))
+    return chars // 4 + 256
+
+
+def _backoff(attempt: int) -> float:
+    return random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * (2 ** attempt)))
+
+
+class LLMPool:
+    def __init__(self, providers: List[Provider] | None = None) -> None:
+        self.providers = self._build_providers() if providers is None else providers
+        self.metrics = {provider.name: ProviderMetrics() for provider in self.providers}
+        self._lock = threading.Lock()
+        self._hedge_executor = ThreadPoolExecutor(max_workers=LLM_POOL_SIZE, thread_name_prefix="llm-hedge")
+
+    def _build_providers(self) -> List[Provider]:
+        http_client = shared_http_client()
+        candidates = []
+        if GROQ_API_KEY:
+            candidates.append(
+                Provider(
+                    "groq",
+                    OpenAI(api_key=GROQ_API_KEY, base_url=GROQ_BASE_URL, http_client=http_client, max_retries=0),
+                    GROQ_MODEL,
+                    ProviderLimiter(GROQ_RPM, GROQ_TPM),
+                )
+            )
+        if OPENAI_API_KEY:
+            candidates.append(
+                Provider(
+                    "openai",
+                    OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL, http_client=http_client, max_retries=0),
+                    OPENAI_MODEL,
+                    ProviderLimiter(OPENAI_RPM, OPENAI_TPM),
+                )
+            )
+        primary = "groq" if LLM_PROVIDER == "groq" else "openai"
+        candidates.sort(key=lambda provider: provider.name != primary)
+        if not LLM_FAILOVER:
+            candidates = candidates[:1]
+        return candidates
+
+    def _record(self, name: str, attr: str) -> None:
+        with self._lock:
+            metrics = self.metrics[name]
+            setattr(metrics, attr, getattr(metrics, attr) + 1)
+
+    def complete(self, **kwargs: Any) -> Any:
+        if not self.providers:
+            raise LLMError("No LLM provider is configured")
+        last_error: Exception | None = None
+        for index, provider in enumerate(self.providers):
+            if index:
+                self._record(provider.name, "failovers")
+            try:
+                return self._with_retries(provider, kwargs, index == len(self.providers) - 1)
+            except Exception as exc:
+                last_error = exc
+        raise LLMError(f"All LLM providers failed: {last_error}") from last_error
+
+    def _with_retries(self, provider: Provider, kwargs: Dict[str, Any], last: bool = True) -> Any:
+        tokens = _estimate_tokens(kwargs)
+        max_wait = max(LLM_RATE_LIMIT_WAIT, provider.limiter.refill_seconds(tokens)) if last else LLM_RETRY_MAX_DELAY
+        attempt = 0
+        while True:
+            if not provider.limiter.acquire(tokens, max_wait):
+                self._record(provider.name, "throttled")
+                raise ProviderBusy(f"{provider.name} rate limit budget exhausted")
+            try:
+                return self._hedged(provider, kwargs, tokens)
+            except Exception as exc:
+                if not _is_retryable(exc) or attempt >= LLM_MAX_RETRIES:
+                    raise
+                delay = _backoff(attempt)
+                retry_after = _retry_after(exc)
+                if retry_after is not None:
+                    if retry_after > LLM_RETRY_MAX_DELAY:
+                        raise
+                    delay = max(delay, retry_after)
+                self._record(provider.name, "retries")
+                time.sleep(delay)
+                attempt += 1
+
+    def _hedged(self, provider: Provider, kwargs: Dict[str, Any], tokens: int) -> Any:
+        if LLM_HEDGE_AFTER <= 0:
+            return self._timed(provider, kwargs)
+        futures = [self._hedge_executor.submit(self._timed, provider, kwargs)]
+        done, _ = wait(futures, timeout=LLM_HEDGE_AFTER)
+        if not done and provider.limiter.acquire(tokens, 0):
+            self._record(provider.name, "hedges")
+            futures.append(self._hedge_executor.submit(self._timed, provider, kwargs))
+        error: BaseException | None = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    def _timed(self, provider: Provider, kwargs: Dict[str, Any]) -> Any:
+        started = time.perf_counter()
+        try:
+            response = provider.client.chat.completions.create(model=provider.model, timeout=LLM_TIMEOUT, **kwargs)
+        except Exception:
+            self._record(provider.name, "errors")
+            raise
+        finally:
+            with self._lock:
+                metrics = self.metrics[provider.name]
+                metrics.requests += 1
+                metrics.latencies_ms.append((time.perf_counter() - started) * 1000)
+        return response
+
+    def metrics_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {name: metrics.snapshot() for name, metrics in self.metrics.items()}
+
+
+_pool: LLMPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_llm_pool() -> LLMPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = LLMPool()
+        return _pool
+
+
+_local_encoder: SentenceTransformer | None = None
+_local_encoder_lock = threading.Lock()
+
+
+def get_local_encoder() -> SentenceTransformer:
+    global _local_encoder
+    with _local_encoder_lock:
+        if _local_encoder is None:
+            from sentence_transformers import SentenceTransformer
+
+            _local_encoder = SentenceTransformer("all-MiniLM-L6-v2")
+        return _local_encoder
+
+
+def embedding_model_id() -> str:
+    return f"openai:{EMBEDDING_MODEL}" if OPENAI_API_KEY else "local:all-MiniLM-L6-v2"
+
+
 class EmbeddingClient:
     def __init__(self) -> None:
-        self._openai = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
-        self._local_model = None
+        self._openai = (
+            OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL, http_client=shared_http_client())
+            if OPENAI_API_KEY
+            else None
+        )
 
     def embed(self, texts: List[str]) -> List[List[float]]:
         if self._openai:
             response = self._openai.embeddings.create(model=EMBEDDING_MODEL, input=texts)
             return [item.embedding for item in response.data]
-        if self._local_model is None:
-            self._local_model = SentenceTransformer("all-MiniLM-L6-v2")
-        return self._local_model.encode(texts, convert_to_numpy=True).tolist()
+        return get_local_encoder().encode(texts, convert_to_numpy=True).tolist()
 
 
 class LLMClient:
-    def __init__(self) -> None:
-        self._client = None
-        self._model = None
-
-        try:
-            if LLM_PROVIDER == "groq" and GROQ_API_KEY:
-                self._client = OpenAI(api_key=GROQ_API_KEY, base_url=GROQ_BASE_URL)
-                self._model = GROQ_MODEL
-            elif OPENAI_API_KEY:
-                self._client = OpenAI(api_key=OPENAI_API_KEY)
-                self._model = OPENAI_MODEL
-        except Exception:
-            self._client = None
-            self._model = None
+    def __init__(self, pool: LLMPool | None = None) -> None:
+        self._pool = pool or get_llm_pool()
 
     def available(self) -> bool:
-        return self._client is not None
+        return bool(self._pool.providers)
 
     def model_name(self) -> str:
-        return self._model or ""
+        return self._pool.providers[0].model if self._pool.providers else ""
 
     def answer_with_context(self, question: str, context: str, history: str = "") -> LLMResult:
-        if not self._client:
+        if not self.available():
             return LLMResult(answer="")
         history_block = f"Conversation so far:\n{history}\n\n" if history else ""
-        try:
-            response = self._client.chat.completions.create(
-                model=self._model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "Answer only using the provided context. If the answer is not in the context, "
-                            "say the information is not available. Use the conversation to understand the question, "
-                            "but do not add facts not in the context."
-                        ),
-                    },
-                    {
-                        "role": "user",
-                        "content": f"{history_block}Context:\n{context}\n\nQuestion: {question}",
-                    },
-                ],
-                temperature=0.1,
-            )
-            return LLMResult(answer=response.choices[0].message.content.strip())
-        except Exception:
-            return LLMResult(answer="")
+        response = self._pool.complete(
+            messages=[
+                {
+                    "role": "system",
+                    "content": (
+                        "Answer only using the provided context. If the answer is not in the context, "
+                        "say the information is not available. Use the conversation to understand the question, "
+                        "but do not add facts not in the context."
+                    ),
+                },
+                {
+                    "role": "user",
+                    "content": f"{history_block}Context:\n{context}\n\nQuestion: {question}",
+                },
+            ],
+            temperature=0.1,
+        )
+        return LLMResult(answer=(response.choices[0].message.content or "").strip())
 
     def summarize(self, text: str) -> str:
-        if not self._client:
+        if not self.available():
             return ""
         try:
-            response = self._client.chat.completions.create(
-                model=self._model,
+            response = self._pool.complete(
                 messages=[
                     {"role": "system", "content": "Summarize the following medical content briefly."},
                     {"role": "user", "content": text},
                 ],
                 temperature=0.2,
             )
-            return response.choices[0].message.content.strip()
-        except Exception:
+        except LLMError:
             return ""
+        return (response.choices[0].message.content or "").strip()
 
-    def request_section_tool(self, section: str) -> Optional[Dict[str, Any]]:
-        if not self._client:
+    def request_section_tool(
+        self, section: str, extra_tools: Optional[List[Dict[str, Any]]] = None
+    ) -> Optional[Dict[str, Any]]:
+        if not self.available():
             return None
         tools = [
             {
@@ -119,23 +366,36 @@ class LLMClient:
                 },
             }
         ]
+        prompt = f"Prepare data for this report section and call the tool: {section}"
+        tool_choice: Any = {"type": "function", "function": {"name": "collect_section_data"}}
+        if extra_tools:
+            tools.extend(extra_tools)
+            prompt = (
+                "Prepare data for this report section. Always call collect_section_data, and also call the other "
+                f"tools when the section asks for specific measurements: {section}"
+            )
+            tool_choice = "required"
         try:
-            response = self._client.chat.completions.create(
-                model=self._model,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": f"Prepare data for this report section and call the tool: {section}",
-                    }
-                ],
+            response = self._pool.complete(
+                messages=[{"role": "user", "content": prompt}],
                 tools=tools,
-                tool_choice={"type": "function", "function": {"name": "collect_section_data"}},
+                tool_choice=tool_choice,
                 temperature=0,
             )
-            message = response.choices[0].message
-            if not message.tool_calls:
-                return None
-            args = json.loads(message.tool_calls[0].function.arguments)
-            return args
-        except Exception:
+        except LLMError:
             return None
+        message = response.choices[0].message
+        result: Dict[str, Any] = {}
+        for call in message.tool_calls or []:
+            try:
+                args = json.loads(call.function.arguments)
+            except json.JSONDecodeError:
+                continue
+            if call.function.name == "collect_section_data":
+                result.update(args)
+            else:
+                result[call.function.name] = args
+        return result or None
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        return self._pool.metrics_snapshot()
@@ -1,29 +1,52 @@
 from __future__ import annotations
 
+import json
+import secrets
 import uuid
 from pathlib import Path
-from typing import List
+from typing import Any, Dict, List
 
-from fastapi import FastAPI, File, UploadFile
+from fastapi import Depends, FastAPI, File, Form, Header, HTTPException, Query, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-
-from .config import LLM_PROVIDER, MAX_HISTORY, REPORT_DIR, TOP_K, UPLOAD_DIR, ensure_dirs
-from .drive import download_public_folder, download_with_service_account
+from starlette.concurrency import run_in_threadpool
+
+from .batch import NOT_AVAILABLE, answer_batch, chunk_citations
+from .config import (
+    ADMIN_TOKEN,
+    LLM_PROVIDER,
+    MAX_HISTORY,
+    PROFILE_ENABLED,
+    REPORT_DIR,
+    SNAPSHOT_DIR,
+    TOP_K,
+    UPLOAD_DIR,
+    ensure_dirs,
+)
+from .drive import configured_folder_id, download_public_folder, download_with_service_account
+from .extractive import extract_answer
 from .ingest import build_chunk_payload, ingest_file
-from .llm import LLMClient
-from .schemas import ChatRequest, ChatResponse, ReportRequest, ReportResponse
+from .llm import LLMClient, LLMError
+from .profiling import ProfilingMiddleware, profiler
+from .rerank import retrieve
+from .scheduling import Overloaded, scheduler
+from .schemas import BatchChatRequest, ChatRequest, ChatResponse, ReportRequest, ReportResponse
 from .storage import (
     add_message,
     clear_docs,
     clear_history,
     create_session_id,
     delete_doc,
+    delete_shard_docs,
     get_doc,
     get_history,
     load_docs,
+    shard_doc_ids,
 )
+from .snapshot import SnapshotError, export_snapshot, import_snapshot
+from .tables import answer_question, clear_tables, delete_tables, format_result, query_values
+from .utils import DEFAULT_SHARD, InvalidShard, normalize_shard
 from .vectorstore import VectorStore
 
 
@@ -35,11 +58,32 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if PROFILE_ENABLED:
+    app.add_middleware(ProfilingMiddleware, profiler=profiler)
+
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded) -> JSONResponse:
+    return JSONResponse({"error": str(exc)}, status_code=429, headers={"Retry-After": str(exc.retry_after)})
+
+
+@app.exception_handler(InvalidShard)
+async def invalid_shard_handler(request: Request, exc: InvalidShard) -> JSONResponse:
+    return JSONResponse({"error": str(exc)}, status_code=400)
+
+
+def require_admin(x_admin_token: str | None = Header(None)) -> None:
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled until ADMIN_TOKEN is set")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Admin token required")
 
 
 @app.on_event("startup")
 async def startup_event() -> None:
     ensure_dirs()
+    if PROFILE_ENABLED:
+        profiler.start()
 
 
 app.mount("/static", StaticFiles(directory=str(Path(__file__).parent / "static")), name="static")
@@ -59,6 +103,8 @@ async def health() -> dict:
         "llm_enabled": llm.available(),
         "llm_provider": LLM_PROVIDER,
         "llm_model": llm.model_name(),
+        "llm_metrics": llm.metrics(),
+        "scheduler": scheduler.stats(),
     }
 
 
@@ -79,10 +125,32 @@ async def delete_document(doc_id: str) -> dict:
             Path(path).unlink(missing_ok=True)
         except Exception:
             pass
-    vectorstore.delete_doc(doc_id)
+    vectorstore.delete_doc(doc_id, removed.get("shard"))
+    delete_tables(doc_id)
     return {"deleted": removed}
 
 
+@app.get("/shards")
+async def list_shards() -> dict:
+    return {"shards": VectorStore().shard_counts()}
+
+
+@app.delete("/shards/{shard}")
+async def drop_shard(shard: str) -> dict:
+    shard = normalize_shard(shard)
+    dropped = VectorStore().drop_shard(shard)
+    removed = delete_shard_docs(shard)
+    for doc in removed:
+        path = doc.get("path")
+        if path:
+            try:
+                Path(path).unlink(missing_ok=True)
+            except Exception:
+                pass
+        delete_tables(doc["id"])
+    return {"shard": shard, "dropped": dropped, "documents": len(removed)}
+
+
 @app.post("/documents/clear")
 async def clear_documents() -> dict:
     vectorstore = VectorStore()
@@ -96,89 +164,162 @@ async def clear_documents() -> dict:
                 pass
     removed = clear_docs()
     vectorstore.reset()
+    clear_tables()
     return {"cleared": removed}
 
 
+def _tenant_shard(shard: str | None) -> str | None:
+    if shard == DEFAULT_SHARD:
+        raise InvalidShard(f"Shard id {DEFAULT_SHARD!r} is reserved for unsharded documents")
+    return normalize_shard(shard) if shard else None
+
+
+def _ingest_one(
+    vectorstore: VectorStore,
+    content: bytes,
+    filename: str,
+    source: str,
+    source_link: str | None = None,
+    shard: str | None = None,
+) -> Dict[str, Any]:
+    meta = ingest_file(content, filename, source=source, source_link=source_link, shard=shard)
+    doc = get_doc(meta["id"])
+    if doc:
+        chunks = meta.get("chunk_text", [])
+        chunk_docs, metadatas, ids = build_chunk_payload(
+            doc_id=doc["id"],
+            doc_name=doc["name"],
+            source_link=doc.get("source_link"),
+            chunks=chunks,
+            shard=doc.get("shard"),
+        )
+        vectorstore.add_chunks(chunk_docs, metadatas, ids, shard=doc.get("shard"))
+    return meta
+
+
 @app.post("/upload")
-async def upload_files(files: List[UploadFile] = File(...)) -> dict:
-    vectorstore = VectorStore()
-    responses = []
-    for file in files:
-        content = await file.read()
-        meta = ingest_file(content, file.filename, source="upload")
-        doc = get_doc(meta["id"])
-        if doc:
-            chunks = meta.get("chunk_text", [])
-            chunk_docs, metadatas, ids = build_chunk_payload(
-                doc_id=doc["id"],
-                doc_name=doc["name"],
-                source_link=doc.get("source_link"),
-                chunks=chunks,
-            )
-            vectorstore.add_chunks(chunk_docs, metadatas, ids)
-        responses.append(meta)
+async def upload_files(files: List[UploadFile] = File(...), shard: str | None = Form(None)) -> dict:
+    shard = _tenant_shard(shard)
+    async with scheduler.admit("upload"):
+        vectorstore = VectorStore()
+        responses = []
+        for file in files:
+            content = await file.read()
+            meta = await scheduler.run("upload", _ingest_one, vectorstore, content, file.filename, "upload", None, shard)
+            responses.append(meta)
     return {"uploaded": responses}
 
 
+def _download_drive() -> List[Dict[str, str]]:
+    return download_with_service_account(UPLOAD_DIR) or download_public_folder(UPLOAD_DIR)
+
+
 @app.post("/ingest/drive")
-async def ingest_drive() -> dict:
-    vectorstore = VectorStore()
-    downloaded = download_with_service_account(UPLOAD_DIR) or download_public_folder(UPLOAD_DIR)
-    ingested = []
-    for item in downloaded:
-        path = Path(item["path"])
-        if path.is_dir():
-            continue
-        content = path.read_bytes()
-        meta = ingest_file(content, path.name, source="drive", source_link=item.get("source_link"))
-        doc = get_doc(meta["id"])
-        if doc:
-            chunks = meta.get("chunk_text", [])
-            chunk_docs, metadatas, ids = build_chunk_payload(doc["id"], doc["name"], doc.get("source_link"), chunks)
-            vectorstore.add_chunks(chunk_docs, metadatas, ids)
-        ingested.append(meta)
+async def ingest_drive(shard: str | None = None) -> dict:
+    shard = _tenant_shard(shard or configured_folder_id() or None)
+    async with scheduler.admit("upload"):
+        vectorstore = VectorStore()
+        downloaded = await run_in_threadpool(_download_drive)
+        ingested = []
+        for item in downloaded:
+            path = Path(item["path"])
+            if path.is_dir():
+                continue
+            content = path.read_bytes()
+            meta = await scheduler.run(
+                "upload", _ingest_one, vectorstore, content, path.name, "drive", item.get("source_link"), shard
+            )
+            ingested.append(meta)
     return {"ingested": ingested}
 
 
-@app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest) -> ChatResponse:
-    session_id = request.session_id or create_session_id()
-    vectorstore = VectorStore()
-    llm = LLMClient()
-
+def _prepare_chat(request: ChatRequest, session_id: str) -> Dict[str, Any]:
     add_message(session_id, "user", request.message)
 
-    results = vectorstore.query(request.message, TOP_K)
+    table_result = answer_question(request.message, shard_doc_ids(request.shards))
+    if table_result:
+        citations = []
+        for match in table_result["matches"][:1]:
+            doc = get_doc(match["doc_id"]) or {}
+            citations.append(
+                {
+                    "doc_name": doc.get("name", ""),
+                    "chunk_id": match.get("chunk_id") or "",
+                    "source_link": doc.get("source_link") or None,
+                }
+            )
+        return {"answer": format_result(table_result), "citations": citations}
+
+    results = retrieve(request.message, VectorStore(), TOP_K, shards=request.shards)
     docs = results.get("documents", [[]])[0]
     metadatas = results.get("metadatas", [[]])[0]
+    if not docs:
+        return {"answer": NOT_AVAILABLE, "citations": []}
+
+    if not LLMClient().available():
+        extracted = extract_answer(request.message, docs, metadatas)
+        return extracted or {"answer": docs[0], "citations": chunk_citations(metadatas)}
 
     history = get_history(session_id, MAX_HISTORY)
     history_text = "\n".join([f"{item['role']}: {item['content']}" for item in history])
+    return {
+        "context": "\n\n".join(docs),
+        "history": history_text,
+        "citations": chunk_citations(metadatas),
+    }
 
-    citations = []
-    context = "\n\n".join(docs)
-
-    if not docs:
-        answer = "The information is not available in the provided documents."
-    else:
-        if llm.available():
-            answer = llm.answer_with_context(request.message, context, history_text).answer
-            if not answer:
-                answer = "The information is not available in the provided documents."
-        else:
-            answer = docs[0]
-
-    for meta in metadatas:
-        citations.append(
-            {
-                "doc_name": meta.get("doc_name", ""),
-                "chunk_id": meta.get("chunk_id", ""),
-                "source_link": meta.get("source_link") or None,
-            }
-        )
 
+def _complete_chat(request: ChatRequest, session_id: str, prepared: Dict[str, Any]) -> ChatResponse:
+    answer = prepared.get("answer")
+    if answer is None:
+        try:
+            answer = LLMClient().answer_with_context(request.message, prepared["context"], prepared["history"]).answer
+        except LLMError as exc:
+            raise HTTPException(status_code=503, detail=str(exc)) from exc
+        answer = answer or NOT_AVAILABLE
     add_message(session_id, "assistant", answer)
-    return ChatResponse(session_id=session_id, answer=answer, citations=citations)
+    return ChatResponse(session_id=session_id, answer=answer, citations=prepared["citations"])
+
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat(request: ChatRequest) -> ChatResponse:
+    session_id = request.session_id or create_session_id()
+    async with scheduler.admit("chat"):
+        prepared = await scheduler.run("chat", _prepare_chat, request, session_id)
+        return await run_in_threadpool(_complete_chat, request, session_id, prepared)
+
+
+@app.post("/chat/batch")
+async def chat_batch(request: BatchChatRequest) -> StreamingResponse:
+    for shard in request.shards or []:
+        normalize_shard(shard)
+    scheduler.lanes["batch"].check()
+
+    async def stream():
+        try:
+            async with scheduler.admit("batch"):
+                async for item in answer_batch(
+                    request.questions, request.doc_ids, request.top_k or TOP_K, shards=request.shards
+                ):
+                    yield json.dumps(item) + "\n"
+        except Overloaded as exc:
+            yield json.dumps({"error": str(exc), "retry_after": exc.retry_after}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.get("/tables/query")
+async def table_query(
+    measure: str,
+    agg: str = "max",
+    since: str | None = None,
+    until: str | None = None,
+    doc_ids: List[str] | None = Query(None),
+) -> dict:
+    try:
+        return query_values(measure, agg, doc_ids=doc_ids, since=since, until=until)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
 
 
 @app.post("/chat/clear")
@@ -191,7 +332,10 @@ async def clear_chat(session_id: str | None = None) -> dict:
 async def report(request: ReportRequest) -> ReportResponse:
     from .report import build_report
 
-    result = build_report(request.sections, request.include_summary)
+    async with scheduler.admit("report"):
+        result = await scheduler.run(
+            "report", build_report, request.sections, request.include_summary, request.shards
+        )
     download_url = f"/reports/{result['report_id']}"
     return ReportResponse(report_id=result["report_id"], download_url=download_url)
 
@@ -202,3 +346,51 @@ async def download_report(report_id: str):
     if not report_path.exists():
         return {"error": "Report not found"}
     return FileResponse(report_path, media_type="application/pdf", filename=report_path.name)
+
+
+@app.post("/admin/snapshots", dependencies=[Depends(require_admin)])
+async def create_snapshot(shards: List[str] | None = Query(None)) -> dict:
+    name = f"snapshot_{uuid.uuid4().hex}.tar"
+    async with scheduler.admit("report"):
+        stats = await scheduler.run("report", export_snapshot, SNAPSHOT_DIR / name, shards)
+    return {**stats, "name": name, "download_url": f"/admin/snapshots/{name}"}
+
+
+@app.get("/admin/snapshots", dependencies=[Depends(require_admin)])
+async def list_snapshots() -> dict:
+    snapshots = [
+        {"name": path.name, "bytes": path.stat().st_size}
+        for path in sorted(SNAPSHOT_DIR.glob("snapshot_*.tar"))
+    ]
+    return {"snapshots": snapshots}
+
+
+@app.get("/admin/snapshots/{name}", dependencies=[Depends(require_admin)])
+async def download_snapshot(name: str):
+    path = SNAPSHOT_DIR / Path(name).name
+    if not path.exists() or path.suffix != ".tar":
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    return FileResponse(path, media_type="application/x-tar", filename=path.name)
+
+
+@app.post("/admin/snapshots/import", dependencies=[Depends(require_admin)])
+async def restore_snapshot(file: UploadFile = File(...), force: bool = False) -> dict:
+    async with scheduler.admit("upload"):
+        try:
+            return await scheduler.run("upload", import_snapshot, file.file, force=force)
+        except SnapshotError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+@app.get("/admin/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles() -> dict:
+    return {"enabled": PROFILE_ENABLED, "profiles": profiler.list()}
+
+
+@app.get("/admin/profiles/{capture_id}", dependencies=[Depends(require_admin)])
+async def download_profile(capture_id: str) -> Response:
+    capture = profiler.get(capture_id)
+    if capture is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    headers = {"Content-Disposition": f'attachment; filename="profile_{capture.id}.folded"'}
+    return Response(capture.folded, media_type="text/plain", headers=headers)
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from .config import (
+    PROFILE_BUFFER_SAMPLES,
+    PROFILE_INTERVAL_MS,
+    PROFILE_RING_SIZE,
+    PROFILE_SAMPLE_RATE,
+    PROFILE_SLOW_MS,
+)
+
+
+IDLE_FUNCTIONS = {"wait", "select", "poll", "_worker", "_wait_for_tstate_lock", "accept"}
+ADMIN_PREFIX = "/admin/profiles"
+
+Frame = Tuple[str, str, int]
+
+
+@dataclass
+class Capture:
+    id: str
+    method: str
+    path: str
+    status: int
+    duration_ms: float
+    started_at: str
+    reason: str
+    samples: int
+    folded: str = field(repr=False)
+
+    def summary(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data.pop("folded")
+        return data
+
+
+class Sampler(threading.Thread):
+    def __init__(self, interval: float, max_samples: int) -> None:
+        super().__init__(name="profile-sampler", daemon=True)
+        self._interval = interval
+        self._samples: Deque[Tuple[float, int, Tuple[Frame, ...]]] = deque(maxlen=max_samples)
+        self._active = 0
+        self._lock = threading.Lock()
+        self._busy = threading.Event()
+
+    def enter(self) -> None:
+        with self._lock:
+            self._active += 1
+            self._busy.set()
+
+    def exit(self) -> None:
+        with self._lock:
+            self._active -= 1
+            if self._active <= 0:
+                self._active = 0
+                self._busy.clear()
+
+    def run(self) -> None:
+        own_id = threading.get_ident()
+        while True:
+            self._busy.wait()
+            now = time.monotonic()
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or frame.f_code.co_name in IDLE_FUNCTIONS:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_filename, code.co_name, code.co_firstlineno))
+                    frame = frame.f_back
+                self._samples.append((now, thread_id, tuple(reversed(stack))))
+            time.sleep(self._interval)
+
+    def window(self, start: float, end: float) -> List[Tuple[int, Tuple[Frame, ...]]]:
+        return [(thread_id, stack) for ts, thread_id, stack in list(self._samples) if start <= ts <= end]
+
+
+def fold(samples: List[Tuple[int, Tuple[Frame, ...]]]) -> str:
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    counts: Counter[str] = Counter()
+    for thread_id, stack in samples:
+        frames = [names.get(thread_id, f"thread-{thread_id}")]
+        frames.extend(f"{name} ({Path(filename).name}:{line})" for filename, name, line in stack)
+        counts[";".join(frame.replace(";", ":") for frame in frames)] += 1
+    return "\n".join(f"{stack} {count}" for stack, count in counts.most_common())
+
+
+class Profiler:
+    def __init__(self) -> None:
+        self.sampler = Sampler(PROFILE_INTERVAL_MS / 1000, PROFILE_BUFFER_SAMPLES)
+        self.captures: Deque[Capture] = deque(maxlen=PROFILE_RING_SIZE)
+
+    def start(self) -> None:
+        if not self.sampler.is_alive():
+            self.sampler.start()
+
+    def capture(self, method: str, path: str, status: int, start: float, end: float, started_at: float, reason: str) -> None:
+        samples = self.sampler.window(start, end)
+        self.captures.append(
+            Capture(
+                id=uuid.uuid4().hex,
+                method=method,
+                path=path,
+                status=status,
+                duration_ms=round((end - start) * 1000, 1),
+                started_at=datetime.utcfromtimestamp(started_at).isoformat(),
+                reason=reason,
+                samples=len(samples),
+                folded=fold(samples),
+            )
+        )
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [capture.summary() for capture in reversed(self.captures)]
+
+    def get(self, capture_id: str) -> Optional[Capture]:
+        return next((capture for capture in self.captures if capture.id == capture_id), None)
+
+
+class ProfilingMiddleware:
+    def __init__(self, app, profiler: Profiler) -> None:
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(ADMIN_PREFIX):
+            await self.app(scope, receive, send)
+            return
+
+        sampled = random.random() < PROFILE_SAMPLE_RATE
+        status = 500
+
+        async def send_wrapper(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started_at = time.time()
+        start = time.monotonic()
+        self.profiler.sampler.enter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.profiler.sampler.exit()
+            end = time.monotonic()
+            if (end - start) * 1000 >= PROFILE_SLOW_MS:
+                reason = "slow"
+            elif sampled:
+                reason = "sampled"
+            else:
+                reason = ""
+            if reason:
+                await run_in_threadpool(self.profiler.capture, scope["method"], scope["path"], status, start, end, started_at, reason)
+
+
+profiler = Profiler()
@@ -1,21 +1,136 @@
 from __future__ import annotations
 
 import uuid
-from pathlib import Path
-from typing import Dict, List
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from xml.sax.saxutils import escape
 
+from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
+from reportlab.lib.styles import StyleSheet1, getSampleStyleSheet
+from reportlab.platypus import (
+    Flowable,
+    Frame,
+    PageTemplate,
+    Paragraph,
+    SimpleDocTemplate,
+    Spacer,
+    Table,
+    TableStyle,
+)
 
-from .config import REPORT_DIR, TOP_K
+from .config import REPORT_DIR, REPORT_SUMMARY_CHARS, REPORT_TABLE_ROWS, TOP_K
 from .llm import LLMClient
-from .storage import get_doc
+from .rerank import retrieve
+from .storage import get_doc, shard_doc_ids
+from .tables import TOOL_SPEC, answer_question, format_result, query_values
+from .utils import table_rows
 from .vectorstore import VectorStore
 
 
-def collect_section_data(section: str, vectorstore: VectorStore, top_k: int) -> Dict[str, List[str]]:
-    result = vectorstore.query(section, top_k)
+TABLE_STYLE = TableStyle(
+    [
+        ("FONTSIZE", (0, 0), (-1, -1), 7),
+        ("LEADING", (0, 0), (-1, -1), 8.5),
+        ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+        ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+    ]
+)
+CELL_CHAR_WIDTH = 3.6
+
+
+class StreamingDocTemplate(SimpleDocTemplate):
+    def build_stream(self, flowables: Iterable[Flowable], window: int = 64) -> None:
+        self._calc()
+        self.addPageTemplates(
+            [
+                PageTemplate(
+                    id=template_id,
+                    frames=Frame(self.leftMargin, self.bottomMargin, self.width, self.height, id="normal"),
+                    pagesize=self.pagesize,
+                )
+                for template_id in ("First", "Later")
+            ]
+        )
+        source = iter(flowables)
+        pending: List[Flowable] = []
+        self._startBuild()
+        self.canv._doctemplate = self
+        try:
+            while True:
+                if len(pending) < window:
+                    pending.extend(islice(source, window))
+                if not pending:
+                    break
+                self.clean_hanging()
+                self.handle_flowable(pending)
+        finally:
+            del self.canv._doctemplate
+        self._endBuild()
+
+
+def table_flowables(text: str, styles: StyleSheet1, width: float, max_rows: int = REPORT_TABLE_ROWS) -> Iterator[Flowable]:
+    rows = table_rows(text)
+    if not rows:
+        return
+    cell_style = styles["BodyText"].clone("TableCell", fontSize=7, leading=8.5)
+    col_width = width / len(rows[0])
+    wrap_chars = max(4, int(col_width / CELL_CHAR_WIDTH))
+
+    def cell(value: str):
+        value = value.strip()
+        if len(value) > wrap_chars:
+            return Paragraph(escape(value), cell_style)
+        return value
+
+    header = [cell(value) for value in rows[0]]
+    col_widths = [col_width] * len(header)
+    body = rows[1:] or [[""] * len(header)]
+    for start in range(0, len(body), max_rows):
+        data = [header] + [[cell(value) for value in row] for row in body[start : start + max_rows]]
+        yield Table(data, colWidths=col_widths, repeatRows=1, splitByRow=1, splitInRow=1, style=TABLE_STYLE)
+    yield Spacer(1, 6)
+
+
+def table_query_flowables(result: Dict[str, Any], styles: StyleSheet1, width: float) -> Iterator[Flowable]:
+    yield Paragraph(escape(format_result(result)), styles["BodyText"])
+    rows = [["Date", "Column", "Value", "Document"]]
+    for match in result["matches"]:
+        doc = get_doc(match["doc_id"]) or {}
+        rows.append([match["date"] or "", match["column"], f"{match['value']:g}", doc.get("name", match["doc_id"])])
+    yield from table_flowables("\n".join("\t".join(row) for row in rows), styles, width)
+
+
+def _section_table_result(
+    section: str,
+    requested: Optional[Dict[str, Any]],
+    doc_ids: Optional[List[str]] = None,
+) -> Optional[Dict[str, Any]]:
+    args = (requested or {}).get(TOOL_SPEC["function"]["name"])
+    if args and args.get("measure"):
+        try:
+            result = query_values(
+                args["measure"],
+                args.get("agg") or "max",
+                doc_ids=doc_ids,
+                since=args.get("since") or None,
+                until=args.get("until") or None,
+            )
+        except ValueError:
+            result = None
+        if result and result["count"]:
+            return result
+    return answer_question(section, doc_ids)
+
+
+def collect_section_data(
+    section: str,
+    vectorstore: VectorStore,
+    top_k: int,
+    shards: Optional[List[str]] = None,
+) -> Dict[str, List[str]]:
+    result = retrieve(section, vectorstore, top_k, shards=shards)
     documents = result.get("documents", [[]])[0]
     metadatas = result.get("metadatas", [[]])[0]
 
@@ -31,42 +146,62 @@ def collect_section_data(section: str, vectorstore: VectorStore, top_k: int) ->
     return {"documents": filtered_docs, "metadatas": filtered_metas}
 
 
-def build_report(sections: List[str], include_summary: bool) -> Dict[str, str]:
-    report_id = uuid.uuid4().hex
-    report_path = REPORT_DIR / f"report_{report_id}.pdf"
-
-    vectorstore = VectorStore()
-    llm = LLMClient()
-    styles = getSampleStyleSheet()
-    story = []
+def _report_flowables(
+    sections: List[str],
+    include_summary: bool,
+    vectorstore: VectorStore,
+    llm: LLMClient,
+    styles: StyleSheet1,
+    width: float,
+    shards: Optional[List[str]] = None,
+) -> Iterator[Flowable]:
+    doc_ids = shard_doc_ids(shards)
     collected_text: List[str] = []
+    collected_chars = 0
+
+    def collect(text: str) -> None:
+        nonlocal collected_chars
+        if include_summary and collected_chars < REPORT_SUMMARY_CHARS:
+            collected_text.append(text[: REPORT_SUMMARY_CHARS - collected_chars])
+            collected_chars += len(collected_text[-1])
 
     for section in sections:
-        requested = llm.request_section_tool(section) if llm.available() else None
+        requested = llm.request_section_tool(section, [TOOL_SPEC]) if llm.available() else None
         section_title = (requested or {}).get("section") or section
-        story.append(Paragraph(section_title, styles["Heading2"]))
-        payload = collect_section_data(section_title, vectorstore, TOP_K)
-        documents = payload["documents"]
-        metadatas = payload["metadatas"]
+        yield Paragraph(escape(section_title), styles["Heading2"])
+        table_result = _section_table_result(section, requested, doc_ids)
+        if table_result:
+            yield from table_query_flowables(table_result, styles, width)
+            collect(format_result(table_result))
+        payload = collect_section_data(section_title, vectorstore, TOP_K, shards)
         table_added = set()
 
-        for text, meta in zip(documents, metadatas):
+        for text, meta in zip(payload["documents"], payload["metadatas"]):
             doc_id = meta.get("doc_id")
             doc = get_doc(doc_id) if doc_id else None
-            story.append(Paragraph(text, styles["BodyText"]))
-            collected_text.append(text)
+            yield Paragraph(escape(text), styles["BodyText"])
+            collect(text)
             if doc and doc.get("tables") and doc_id not in table_added:
                 for table in doc["tables"]:
-                    story.append(Paragraph("<pre>%s</pre>" % table, styles["Code"]))
-                    collected_text.append(table)
+                    yield from table_flowables(table, styles, width)
+                    collect(table)
                 table_added.add(doc_id)
-            story.append(Spacer(1, 12))
+            yield Spacer(1, 12)
 
     if include_summary and llm.available():
         summary = llm.summarize("\n".join(collected_text))
         if summary:
-            story.append(Paragraph("Summary", styles["Heading2"]))
-            story.append(Paragraph(summary, styles["BodyText"]))
+            yield Paragraph("Summary", styles["Heading2"])
+            yield Paragraph(escape(summary), styles["BodyText"])
+
 
-    SimpleDocTemplate(str(report_path), pagesize=letter).build(story)
+def build_report(sections: List[str], include_summary: bool, shards: Optional[List[str]] = None) -> Dict[str, str]:
+    report_id = uuid.uuid4().hex
+    report_path = REPORT_DIR / f"report_{report_id}.pdf"
+
+    vectorstore = VectorStore()
+    llm = LLMClient()
+    styles = getSampleStyleSheet()
+    doc = StreamingDocTemplate(str(report_path), pagesize=letter, pageCompression=1)
+    doc.build_stream(_report_flowables(sections, include_summary, vectorstore, llm, styles, doc.width, shards))
     return {"report_id": report_id, "path": str(report_path)}
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import (
+    RERANK_BATCH_SIZE,
+    RERANK_CACHE_SIZE,
+    RERANK_CANDIDATES,
+    RERANK_ENABLED,
+    RERANK_MODEL,
+)
+from .vectorstore import VectorStore
+
+
+class Reranker:
+    def __init__(self, model_name: str = RERANK_MODEL, cache_size: int = RERANK_CACHE_SIZE) -> None:
+        self._model_name = model_name
+        self._model = None
+        self._cache: OrderedDict[Tuple[str, str], float] = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def _load(self):
+        with self._load_lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+
+                self._model = CrossEncoder(self._model_name, device="cpu", max_length=512)
+            return self._model
+
+    def score(self, query: str, chunk_ids: List[str], texts: List[str]) -> List[float]:
+        query_hash = hashlib.sha1(query.encode("utf-8")).hexdigest()
+        scores: List[float | None] = []
+        missing: List[int] = []
+        with self._lock:
+            for idx, chunk_id in enumerate(chunk_ids):
+                key = (query_hash, chunk_id)
+                cached = self._cache.get(key)
+                if cached is None:
+                    missing.append(idx)
+                else:
+                    self._cache.move_to_end(key)
+                scores.append(cached)
+
+        if missing:
+            pairs = [(query, texts[idx]) for idx in missing]
+            predicted = self._load().predict(
+                pairs,
+                batch_size=RERANK_BATCH_SIZE,
+                convert_to_numpy=True,
+                show_progress_bar=False,
+            )
+            with self._lock:
+                for idx, value in zip(missing, predicted.tolist()):
+                    scores[idx] = float(value)
+                    self._cache[(query_hash, chunk_ids[idx])] = float(value)
+                while len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+        return [float(value) for value in scores]
+
+
+_reranker: Reranker | None = None
+_reranker_lock = threading.Lock()
+
+
+def get_reranker() -> Reranker:
+    global _reranker
+    with _reranker_lock:
+        if _reranker is None:
+            _reranker = Reranker()
+        return _reranker
+
+
+def retrieve(
+    query: str,
+    vectorstore: VectorStore,
+    top_k: int,
+    rerank: bool | None = None,
+    where: Optional[Dict[str, Any]] = None,
+    shards: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    rerank = RERANK_ENABLED if rerank is None else rerank
+    if not rerank:
+        return vectorstore.query(query, top_k, where=where, shards=shards)
+
+    results = vectorstore.query(query, max(top_k, RERANK_CANDIDATES), where=where, shards=shards)
+    return rerank_results(query, results, top_k)
+
+
+def retrieve_many(
+    queries: List[str],
+    vectorstore: VectorStore,
+    top_k: int,
+    rerank: bool | None = None,
+    where: Optional[Dict[str, Any]] = None,
+    shards: Optional[List[str]] = None,
+) -> List[Dict[str, Any]]:
+    rerank = RERANK_ENABLED if rerank is None else rerank
+    if not rerank:
+        return vectorstore.query_many(queries, top_k, where=where, shards=shards)
+
+    results = vectorstore.query_many(queries, max(top_k, RERANK_CANDIDATES), where=where, shards=shards)
+    return [rerank_results(query, result, top_k) for query, result in zip(queries, results)]
+
+
+def rerank_results(query: str, results: Dict[str, Any], top_k: int) -> Dict[str, Any]:
+    documents = results.get("documents", [[]])[0]
+    metadatas = results.get("metadatas", [[]])[0]
+    ids = results.get("ids", [[]])[0]
+    if len(documents) <= 1:
+        return {**results, "rerank_ms": 0.0}
+
+    started = time.perf_counter()
+    scores = get_reranker().score(query, ids, documents)
+    order = sorted(range(len(documents)), key=lambda idx: scores[idx], reverse=True)[:top_k]
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    return {
+        "documents": [[documents[idx] for idx in order]],
+        "metadatas": [[metadatas[idx] for idx in order]],
+        "ids": [[ids[idx] for idx in order]],
+        "scores": [[scores[idx] for idx in order]],
+        "rerank_ms": elapsed_ms,
+    }
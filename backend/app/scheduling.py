@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import math
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from .config import (
+    BATCH_LANE_CONCURRENCY,
+    BATCH_QUEUE,
+    CHAT_CONCURRENCY,
+    CHAT_QUEUE,
+    INTERACTIVE_RESERVED_SLOTS,
+    REPORT_CONCURRENCY,
+    REPORT_QUEUE,
+    UPLOAD_CONCURRENCY,
+    UPLOAD_QUEUE,
+    WORKER_SLOTS,
+)
+
+
+INTERACTIVE = 0
+BULK = 1
+
+
+class Overloaded(Exception):
+    def __init__(self, lane: str, retry_after: int) -> None:
+        super().__init__(f"{lane} queue is full")
+        self.lane = lane
+        self.retry_after = retry_after
+
+
+class PriorityGate:
+    def __init__(self, slots: int, reserved: int) -> None:
+        self._slots = max(1, slots)
+        self._reserved = min(max(0, reserved), self._slots - 1)
+        self._active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+
+    def _limit(self, priority: int) -> int:
+        return self._slots if priority == INTERACTIVE else self._slots - self._reserved
+
+    def _grant(self) -> None:
+        while self._waiters:
+            priority, _, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if self._active >= self._limit(priority):
+                return
+            heapq.heappop(self._waiters)
+            self._active += 1
+            future.set_result(None)
+
+    async def acquire(self, priority: int) -> None:
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        self._grant()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        self._active -= 1
+        self._grant()
+
+    def stats(self) -> Dict[str, int]:
+        return {"slots": self._slots, "active": self._active, "waiting": len(self._waiters)}
+
+
+class Lane:
+    def __init__(self, name: str, priority: int, concurrency: int, max_queue: int) -> None:
+        self.name = name
+        self.priority = priority
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max(0, max_queue)
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._waiting = 0
+        self._active = 0
+        self._rejected = 0
+        self._avg_seconds = 1.0
+
+    def retry_after(self) -> int:
+        backlog = self._waiting + self._active + 1
+        return max(1, math.ceil(self._avg_seconds * backlog / self.concurrency))
+
+    def check(self) -> None:
+        if self._semaphore.locked() and self._waiting >= self.max_queue:
+            self._rejected += 1
+            raise Overloaded(self.name, self.retry_after())
+
+    async def acquire(self) -> float:
+        self.check()
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        self._active += 1
+        return time.perf_counter()
+
+    def release(self, started: float) -> None:
+        self._active -= 1
+        self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * (time.perf_counter() - started)
+        self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self._active,
+            "waiting": self._waiting,
+            "rejected": self._rejected,
+            "concurrency": self.concurrency,
+            "max_queue": self.max_queue,
+            "avg_seconds": round(self._avg_seconds, 3),
+        }
+
+
+class Scheduler:
+    def __init__(self) -> None:
+        self.gate = PriorityGate(WORKER_SLOTS, INTERACTIVE_RESERVED_SLOTS)
+        self.lanes = {
+            "chat": Lane("chat", INTERACTIVE, CHAT_CONCURRENCY, CHAT_QUEUE),
+            "batch": Lane("batch", BULK, BATCH_LANE_CONCURRENCY, BATCH_QUEUE),
+            "upload": Lane("upload", BULK, UPLOAD_CONCURRENCY, UPLOAD_QUEUE),
+            "report": Lane("report", BULK, REPORT_CONCURRENCY, REPORT_QUEUE),
+        }
+
+    @asynccontextmanager
+    async def admit(self, lane: str) -> AsyncIterator[None]:
+        started = await self.lanes[lane].acquire()
+        try:
+            yield
+        finally:
+            self.lanes[lane].release(started)
+
+    async def run(self, lane: str, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        await self.gate.acquire(self.lanes[lane].priority)
+        try:
+            return await run_in_threadpool(func, *args, **kwargs)
+        finally:
+            self.gate.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"workers": self.gate.stats(), "lanes": {name: lane.stats() for name, lane in self.lanes.items()}}
+
+
+class TokenBucket:
+    def __init__(self, per_minute: int) -> None:
+        self.capacity = float(per_minute)
+        self._rate = per_minute / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float, max_wait: float) -> float | None:
+        if self.capacity <= 0:
+            return 0.0
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+            wait = max(0.0, (amount - self._tokens) / self._rate)
+            if wait > max_wait:
+                return None
+            self._tokens -= amount
+            return wait
+
+    def refill_seconds(self, amount: float) -> float:
+        if self.capacity <= 0:
+            return 0.0
+        return min(amount, self.capacity) / self._rate
+
+    def refund(self, amount: float) -> None:
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+
+class ProviderLimiter:
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int) -> None:
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+    def refill_seconds(self, tokens: int) -> float:
+        return max(self.requests.refill_seconds(1), self.tokens.refill_seconds(tokens))
+
+    def acquire(self, tokens: int, max_wait: float) -> bool:
+        request_wait = self.requests.reserve(1, max_wait)
+        if request_wait is None:
+            return False
+        token_wait = self.tokens.reserve(tokens, max_wait)
+        if token_wait is None:
+            self.requests.refund(1)
+            return False
+        time.sleep(max(request_wait, token_wait))
+        return True
+
+
+scheduler = Scheduler()
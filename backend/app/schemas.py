@@ -1,18 +1,23 @@
 from __future__ import annotations
 
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+from .config import BATCH_MAX_QUESTIONS
 
 
 class ChatRequest(BaseModel):
     session_id: Optional[str] = None
     message: str
+    shards: Optional[List[str]] = None
 
 
 class ChatCitation(BaseModel):
     doc_name: str
     chunk_id: str
     source_link: Optional[str] = None
+    start: Optional[int] = None
+    end: Optional[int] = None
 
 
 class ChatResponse(BaseModel):
@@ -21,10 +26,18 @@ class ChatResponse(BaseModel):
     citations: List[ChatCitation]
 
 
+class BatchChatRequest(BaseModel):
+    questions: List[str] = Field(..., min_length=1, max_length=BATCH_MAX_QUESTIONS)
+    doc_ids: Optional[List[str]] = None
+    shards: Optional[List[str]] = None
+    top_k: Optional[int] = Field(None, ge=1)
+
+
 class ReportRequest(BaseModel):
     session_id: Optional[str] = None
     sections: List[str]
     include_summary: bool = False
+    shards: Optional[List[str]] = None
 
 
 class ReportResponse(BaseModel):
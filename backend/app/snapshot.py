@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import io
+import json
+import re
+import shutil
+import struct
+import tarfile
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .config import SNAPSHOT_BATCH_SIZE, TABLE_DIR, ensure_dirs
+from .llm import embedding_model_id
+from .storage import load_docs, save_docs
+from .utils import DEFAULT_SHARD, InvalidShard, normalize_shard
+from .vectorstore import VectorStore
+
+
+SNAPSHOT_VERSION = 1
+MANIFEST = "manifest.json"
+DOCS_MEMBER = "docs.json"
+FRAME_MAGIC = b"MDS1"
+FRAME_HEADER = struct.Struct("<4sII")
+COPY_BUFFER = 1024 * 1024
+TABLE_MEMBER_RE = re.compile(r"tables/([0-9a-f]{32})/(index\.json|table_\d+\.npz)")
+
+
+class SnapshotError(RuntimeError):
+    pass
+
+
+class _HashingReader:
+    def __init__(self, handle: IO[bytes]) -> None:
+        self._handle = handle
+        self.digest = hashlib.sha256()
+        self.bytes = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._handle.read(size)
+        self.digest.update(data)
+        self.bytes += len(data)
+        return data
+
+    def read_exact(self, size: int) -> bytes:
+        chunks = []
+        remaining = size
+        while remaining:
+            data = self.read(remaining)
+            if not data:
+                raise SnapshotError("Unexpected end of snapshot member")
+            chunks.append(data)
+            remaining -= len(data)
+        return b"".join(chunks)
+
+
+def _write_frames(handle: IO[bytes], records: Iterator[Tuple[List[str], np.ndarray, List[str], List[Dict[str, Any]]]]) -> Tuple[int, int, str]:
+    digest = hashlib.sha256()
+    count = 0
+    dim = 0
+    for ids, embeddings, documents, metadatas in records:
+        payload = json.dumps({"ids": ids, "documents": documents, "metadatas": metadatas}).encode("utf-8")
+        vectors = np.ascontiguousarray(embeddings, dtype="<f4")
+        dim = vectors.shape[1] if vectors.ndim == 2 else dim
+        for block in (FRAME_HEADER.pack(FRAME_MAGIC, len(ids), len(payload)), payload, vectors.tobytes()):
+            handle.write(block)
+            digest.update(block)
+        count += len(ids)
+    return count, dim, digest.hexdigest()
+
+
+def _read_frames(reader: _HashingReader, dim: int) -> Iterator[Tuple[List[str], np.ndarray, List[str], List[Dict[str, Any]]]]:
+    while True:
+        header = reader.read(FRAME_HEADER.size)
+        if not header:
+            return
+        if len(header) < FRAME_HEADER.size:
+            header += reader.read_exact(FRAME_HEADER.size - len(header))
+        magic, count, payload_size = FRAME_HEADER.unpack(header)
+        if magic != FRAME_MAGIC:
+            raise SnapshotError("Corrupt vector frame")
+        payload = json.loads(reader.read_exact(payload_size))
+        vectors = np.frombuffer(reader.read_exact(count * dim * 4), dtype="<f4").reshape(count, dim)
+        yield payload["ids"], vectors, payload["documents"], payload["metadatas"]
+
+
+def _file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for block in iter(lambda: handle.read(COPY_BUFFER), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def export_snapshot(path: Path, shards: Optional[List[str]] = None, batch_size: int = SNAPSHOT_BATCH_SIZE) -> Dict[str, Any]:
+    started = time.perf_counter()
+    vectorstore = VectorStore()
+    wanted = [normalize_shard(shard) for shard in shards] if shards else vectorstore.shards()
+    docs = [doc for doc in load_docs() if doc.get("shard", DEFAULT_SHARD) in wanted]
+    doc_ids = {doc["id"] for doc in docs}
+
+    manifest: Dict[str, Any] = {
+        "version": SNAPSHOT_VERSION,
+        "created_at": datetime.utcnow().isoformat(),
+        "embedding_model": embedding_model_id(),
+        "shards": {},
+        "checksums": {},
+    }
+    records = 0
+    with tempfile.TemporaryDirectory() as staging_dir:
+        staging = Path(staging_dir)
+        docs_path = staging / DOCS_MEMBER
+        docs_path.write_text(json.dumps(docs), encoding="utf-8")
+        manifest["checksums"][DOCS_MEMBER] = _file_digest(docs_path)
+        members: List[Tuple[str, Path]] = [(DOCS_MEMBER, docs_path)]
+
+        for shard in wanted:
+            member = f"shards/{shard}.frames"
+            frame_path = staging / f"{shard}.frames"
+            with frame_path.open("wb") as handle:
+                count, dim, digest = _write_frames(handle, vectorstore.iter_records(shard, batch_size))
+            manifest["shards"][shard] = {"member": member, "records": count, "dim": dim}
+            manifest["checksums"][member] = digest
+            members.append((member, frame_path))
+            records += count
+
+        for table_path in sorted(TABLE_DIR.glob("*/*")):
+            member = f"tables/{table_path.parent.name}/{table_path.name}"
+            if table_path.parent.name in doc_ids and table_path.is_file() and TABLE_MEMBER_RE.fullmatch(member):
+                manifest["checksums"][member] = _file_digest(table_path)
+                members.append((member, table_path))
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_suffix(path.suffix + ".partial")
+        with tarfile.open(partial, "w") as archive:
+            manifest_bytes = json.dumps(manifest, indent=2).encode("utf-8")
+            info = tarfile.TarInfo(MANIFEST)
+            info.size = len(manifest_bytes)
+            info.mtime = int(time.time())
+            archive.addfile(info, io.BytesIO(manifest_bytes))
+            for member, source in members:
+                archive.add(str(source), arcname=member, recursive=False)
+        partial.replace(path)
+
+    elapsed = time.perf_counter() - started
+    size = path.stat().st_size
+    return {
+        "path": str(path),
+        "documents": len(docs),
+        "shards": len(wanted),
+        "records": records,
+        "bytes": size,
+        "seconds": elapsed,
+        "records_per_second": records / elapsed if elapsed else 0.0,
+    }
+
+
+def import_snapshot(
+    source: IO[bytes],
+    batch_size: int = SNAPSHOT_BATCH_SIZE,
+    force: bool = False,
+) -> Dict[str, Any]:
+    started = time.perf_counter()
+    vectorstore = VectorStore()
+    batch_size = min(batch_size, vectorstore.max_batch_size())
+    manifest: Dict[str, Any] | None = None
+    records = 0
+    shard_members: Dict[str, Tuple[str, int]] = {}
+
+    with tempfile.TemporaryDirectory() as staging_dir:
+        staging = Path(staging_dir)
+        staged: Dict[str, Path] = {}
+        with tarfile.open(fileobj=source, mode="r|*") as archive:
+            for info in archive:
+                if not info.isfile():
+                    continue
+                handle = archive.extractfile(info)
+                if manifest is None:
+                    if info.name != MANIFEST:
+                        raise SnapshotError("Snapshot must start with manifest.json")
+                    manifest = json.loads(handle.read())
+                    if manifest.get("version") != SNAPSHOT_VERSION:
+                        raise SnapshotError(f"Unsupported snapshot version: {manifest.get('version')}")
+                    if manifest.get("embedding_model") != embedding_model_id() and not force:
+                        raise SnapshotError(
+                            f"Snapshot embeddings come from {manifest.get('embedding_model')}, "
+                            f"this node uses {embedding_model_id()}"
+                        )
+                    try:
+                        shard_members = {
+                            meta["member"]: (normalize_shard(shard), meta["dim"])
+                            for shard, meta in manifest["shards"].items()
+                        }
+                    except InvalidShard as exc:
+                        raise SnapshotError(str(exc)) from exc
+                    continue
+
+                expected = manifest["checksums"].get(info.name)
+                known = (
+                    info.name == DOCS_MEMBER
+                    or info.name in shard_members
+                    or TABLE_MEMBER_RE.fullmatch(info.name) is not None
+                )
+                if expected is None or not known or info.name in staged:
+                    raise SnapshotError(f"Unexpected member: {info.name}")
+                reader = _HashingReader(handle)
+                target = staging / f"{len(staged)}.member"
+                with target.open("wb") as staged_file:
+                    shutil.copyfileobj(reader, staged_file, COPY_BUFFER)
+                if reader.digest.hexdigest() != expected:
+                    raise SnapshotError(f"Checksum mismatch for {info.name}")
+                staged[info.name] = target
+
+        if manifest is None:
+            raise SnapshotError("Empty snapshot")
+        missing = set(manifest["checksums"]) - set(staged)
+        if missing:
+            raise SnapshotError(f"Snapshot is missing members: {sorted(missing)}")
+
+        for member, (shard, dim) in shard_members.items():
+            with staged[member].open("rb") as handle:
+                for ids, vectors, texts, metadatas in _read_frames(_HashingReader(handle), dim):
+                    for start in range(0, len(ids), batch_size):
+                        end = start + batch_size
+                        vectorstore.add_records(shard, ids[start:end], vectors[start:end], texts[start:end], metadatas[start:end])
+                    records += len(ids)
+
+        for member, path in staged.items():
+            match = TABLE_MEMBER_RE.fullmatch(member)
+            if match:
+                doc_id, file_name = match.groups()
+                target_dir = TABLE_DIR / doc_id
+                target_dir.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(path, target_dir / file_name)
+
+        incoming = json.loads(staged[DOCS_MEMBER].read_text(encoding="utf-8"))
+        existing = load_docs()
+        known_ids = {doc.get("id") for doc in existing}
+        merged = existing + [doc for doc in incoming if doc.get("id") not in known_ids]
+        documents = len(merged) - len(existing)
+        save_docs(merged)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "documents": documents,
+        "shards": len(manifest["shards"]),
+        "records": records,
+        "seconds": elapsed,
+        "records_per_second": records / elapsed if elapsed else 0.0,
+    }
+
+
+def _print_stats(action: str, stats: Dict[str, Any], size: int) -> None:
+    seconds = stats["seconds"] or 1e-9
+    print(
+        f"{action} {stats['records']} vectors, {stats['documents']} documents, {stats['shards']} shard(s) "
+        f"in {seconds:.1f}s ({stats['records_per_second']:.0f} vectors/s, {size / 2**20 / seconds:.1f} MiB/s)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export or import an index snapshot.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_cmd = commands.add_parser("export", help="Write the current index to a snapshot archive.")
+    export_cmd.add_argument("path", type=Path)
+    export_cmd.add_argument("--shard", action="append", help="Only export this shard (repeatable).")
+    import_cmd = commands.add_parser("import", help="Load a snapshot archive without re-embedding.")
+    import_cmd.add_argument("path", type=Path)
+    import_cmd.add_argument("--force", action="store_true", help="Import even if the embedding model differs.")
+    for command in (export_cmd, import_cmd):
+        command.add_argument("--batch-size", type=int, default=SNAPSHOT_BATCH_SIZE)
+    args = parser.parse_args()
+    ensure_dirs()
+
+    if args.command == "export":
+        stats = export_snapshot(args.path, args.shard, args.batch_size)
+        _print_stats("Exported", stats, stats["bytes"])
+    else:
+        with args.path.open("rb") as handle:
+            stats = import_snapshot(handle, args.batch_size, args.force)
+        _print_stats("Imported", stats, args.path.stat().st_size)
+
+
+if __name__ == "__main__":
+    main()
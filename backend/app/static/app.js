@@ -131,7 +131,8 @@ chatBtn.addEventListener("click", async () => {
   addChatEntry("Assistant", data.answer);
   if (data.citations?.length) {
     const cite = data.citations.map((c) => {
-      const label = `${c.doc_name} (${c.chunk_id})`;
+      const span = c.start != null ? `, chars ${c.start}-${c.end}` : "";
+      const label = `${c.doc_name} (${c.chunk_id}${span})`;
       if (c.source_link) {
         return `<a href='${c.source_link}' target='_blank'>${label}</a>`;
       }
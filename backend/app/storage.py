@@ -8,6 +8,7 @@ from pathlib import Path
 from typing import Any, Dict, List
 
 from .config import DOC_STORE, SESSION_DB
+from .utils import DEFAULT_SHARD, normalize_shard
 
 
 def load_docs() -> List[Dict[str, Any]]:
@@ -57,6 +58,20 @@ def delete_doc(doc_id: str) -> Dict[str, Any] | None:
     return removed
 
 
+def shard_doc_ids(shards: List[str] | None) -> List[str] | None:
+    if not shards:
+        return None
+    wanted = {normalize_shard(shard) for shard in shards}
+    return [doc["id"] for doc in load_docs() if doc.get("shard", DEFAULT_SHARD) in wanted]
+
+
+def delete_shard_docs(shard: str) -> List[Dict[str, Any]]:
+    docs = load_docs()
+    removed = [doc for doc in docs if doc.get("shard", DEFAULT_SHARD) == shard]
+    save_docs([doc for doc in docs if doc.get("shard", DEFAULT_SHARD) != shard])
+    return removed
+
+
 def clear_docs() -> int:
     docs = load_docs()
     save_docs([])
@@ -0,0 +1,416 @@
+from __future__ import annotations
+
+import json
+import re
+import shutil
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .config import TABLE_DIR
+from .utils import table_rows
+
+
+INDEX_FILE = "index.json"
+MAX_TERMS = 200
+TYPE_THRESHOLD = 0.8
+VALUE_COLUMN_HINTS = ("value", "result", "level", "reading")
+AGGREGATES = {"max", "min", "mean", "sum", "count", "latest", "earliest"}
+
+TOOL_SPEC = {
+    "type": "function",
+    "function": {
+        "name": "query_table_values",
+        "description": "Filter and aggregate numeric values (e.g. lab results) from extracted document tables.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "measure": {"type": "string", "description": "Column or test name, e.g. creatinine."},
+                "agg": {"type": "string", "enum": sorted(AGGREGATES)},
+                "since": {"type": "string", "description": "ISO date lower bound (inclusive)."},
+                "until": {"type": "string", "description": "ISO date upper bound (inclusive)."},
+            },
+            "required": ["measure", "agg"],
+        },
+    },
+}
+
+_index_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+
+def _doc_dir(doc_id: str) -> Path:
+    return TABLE_DIR / doc_id
+
+
+def _column_names(header: List[str]) -> List[str]:
+    names: List[str] = []
+    for idx, raw in enumerate(header):
+        name = raw.strip() or f"column_{idx}"
+        if name in names:
+            name = f"{name}_{idx}"
+        names.append(name)
+    return names
+
+
+def _typed_column(values: pd.Series) -> Tuple[str, np.ndarray]:
+    present = values.str.strip() != ""
+    total = int(present.sum())
+    if total:
+        numeric = pd.to_numeric(values.str.replace(r"^[<>≤≥~]\s*|,", "", regex=True), errors="coerce")
+        if numeric[present].notna().sum() >= TYPE_THRESHOLD * total:
+            return "number", numeric.to_numpy(dtype="float64")
+        dates = pd.to_datetime(values.where(present), errors="coerce", format="mixed")
+        if dates[present].notna().sum() >= TYPE_THRESHOLD * total:
+            return "date", dates.to_numpy(dtype="datetime64[s]")
+    return "string", values.to_numpy(dtype=str)
+
+
+def _column_stats(kind: str, array: np.ndarray) -> Dict[str, Any]:
+    if kind == "number":
+        valid = array[~np.isnan(array)]
+        if not valid.size:
+            return {"count": 0}
+        return {
+            "count": int(valid.size),
+            "min": float(valid.min()),
+            "max": float(valid.max()),
+            "mean": float(valid.mean()),
+        }
+    if kind == "date":
+        valid = array[~np.isnat(array)]
+        if not valid.size:
+            return {"count": 0}
+        return {"count": int(valid.size), "min": str(valid.min()), "max": str(valid.max())}
+    terms = sorted({value.strip().lower() for value in array.tolist() if value.strip()})
+    return {"count": len(terms), "terms": terms[:MAX_TERMS], "truncated": len(terms) > MAX_TERMS}
+
+
+def store_tables(doc_id: str, tables: List[Tuple[str, str]]) -> Dict[str, Any]:
+    doc_dir = _doc_dir(doc_id)
+    doc_dir.mkdir(parents=True, exist_ok=True)
+    entries = []
+    for table_idx, (chunk_id, text) in enumerate(tables):
+        rows = table_rows(text)
+        if len(rows) < 2:
+            continue
+        names = _column_names(rows[0])
+        frame = pd.DataFrame(rows[1:], columns=names, dtype=str)
+        arrays: Dict[str, np.ndarray] = {}
+        columns = []
+        for col_idx, name in enumerate(names):
+            kind, array = _typed_column(frame[name])
+            key = f"c{col_idx}"
+            arrays[key] = array
+            columns.append({"name": name, "key": key, "kind": kind, "stats": _column_stats(kind, array)})
+        file_name = f"table_{table_idx}.npz"
+        np.savez(doc_dir / file_name, **arrays)
+        entries.append(
+            {
+                "table": table_idx,
+                "chunk_id": chunk_id,
+                "file": file_name,
+                "rows": len(rows) - 1,
+                "columns": columns,
+            }
+        )
+    index = {"doc_id": doc_id, "tables": entries}
+    with (doc_dir / INDEX_FILE).open("w", encoding="utf-8") as handle:
+        json.dump(index, handle)
+    return index
+
+
+def delete_tables(doc_id: str) -> None:
+    _index_cache.pop(doc_id, None)
+    shutil.rmtree(_doc_dir(doc_id), ignore_errors=True)
+
+
+def clear_tables() -> None:
+    _index_cache.clear()
+    if TABLE_DIR.exists():
+        shutil.rmtree(TABLE_DIR, ignore_errors=True)
+    TABLE_DIR.mkdir(parents=True, exist_ok=True)
+
+
+def load_index(doc_id: str) -> Dict[str, Any] | None:
+    path = _doc_dir(doc_id) / INDEX_FILE
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        _index_cache.pop(doc_id, None)
+        return None
+    cached = _index_cache.get(doc_id)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with path.open("r", encoding="utf-8") as handle:
+        index = json.load(handle)
+    _index_cache[doc_id] = (mtime, index)
+    return index
+
+
+def _indexes(doc_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    if doc_ids is None:
+        doc_ids = [path.parent.name for path in TABLE_DIR.glob(f"*/{INDEX_FILE}")]
+    return [index for index in (load_index(doc_id) for doc_id in doc_ids) if index]
+
+
+def measure_key(text: str) -> str:
+    text = re.sub(r"\([^)]*\)", " ", text.lower())
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text).split())
+
+
+def _matcher(measure: str, exact: bool):
+    if exact:
+        key = measure_key(measure)
+        return lambda text: measure_key(text) == key
+    needle = measure.strip().lower()
+    return lambda text: needle in text.lower()
+
+
+def known_measure(measure: str, doc_ids: Optional[List[str]] = None, exact: bool = False) -> bool:
+    matches = _matcher(measure, exact)
+    for index in _indexes(doc_ids):
+        for table in index["tables"]:
+            for column in table["columns"]:
+                if matches(column["name"]):
+                    return True
+                stats = column["stats"]
+                if column["kind"] == "string" and any(matches(term) for term in stats.get("terms", [])):
+                    return True
+    return False
+
+
+def _value_column(columns: List[Dict[str, Any]]) -> Dict[str, Any] | None:
+    numeric = [column for column in columns if column["kind"] == "number"]
+    for column in numeric:
+        if any(hint in column["name"].lower() for hint in VALUE_COLUMN_HINTS):
+            return column
+    return numeric[0] if numeric else None
+
+
+def _date_bounds_overlap(column: Dict[str, Any], since: Optional[np.datetime64], until: Optional[np.datetime64]) -> bool:
+    stats = column["stats"]
+    if not stats.get("count"):
+        return False
+    if since is not None and np.datetime64(stats["max"]) < since:
+        return False
+    if until is not None and np.datetime64(stats["min"]) > until:
+        return False
+    return True
+
+
+def query_values(
+    measure: str,
+    agg: str = "max",
+    doc_ids: Optional[List[str]] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: int = 5,
+    exact: bool = False,
+) -> Dict[str, Any]:
+    started = time.perf_counter()
+    agg = agg.lower()
+    if agg not in AGGREGATES:
+        raise ValueError(f"Unsupported aggregate: {agg}")
+    needle = measure.strip().lower()
+    matches = _matcher(measure, exact)
+    since_ts = np.datetime64(since, "s") if since else None
+    until_ts = np.datetime64(until, "s") + np.timedelta64(1, "D") - np.timedelta64(1, "s") if until else None
+
+    values: List[np.ndarray] = []
+    dates: List[np.ndarray] = []
+    sources: List[Tuple[Dict[str, Any], Dict[str, Any], str, np.ndarray]] = []
+
+    for index in _indexes(doc_ids):
+        doc_dir = _doc_dir(index["doc_id"])
+        for table in index["tables"]:
+            columns = table["columns"]
+            date_column = next((column for column in columns if column["kind"] == "date"), None)
+            if since_ts is not None or until_ts is not None:
+                if date_column is None or not _date_bounds_overlap(date_column, since_ts, until_ts):
+                    continue
+
+            targets: List[Tuple[Dict[str, Any], List[Dict[str, Any]]]] = [
+                (column, [])
+                for column in columns
+                if column["kind"] == "number" and column["stats"].get("count") and matches(column["name"])
+            ]
+            value_column = _value_column(columns)
+            if value_column is not None and value_column not in [target for target, _ in targets]:
+                label_columns = [
+                    column
+                    for column in columns
+                    if column["kind"] == "string"
+                    and (column["stats"].get("truncated") or any(matches(term) for term in column["stats"].get("terms", [])))
+                ]
+                if label_columns:
+                    targets.append((value_column, label_columns))
+            if not targets:
+                continue
+
+            with np.load(doc_dir / table["file"], allow_pickle=False) as arrays:
+                date_array = arrays[date_column["key"]] if date_column else None
+                for target, label_columns in targets:
+                    array = arrays[target["key"]]
+                    mask = ~np.isnan(array)
+                    if label_columns:
+                        labelled = np.zeros(array.shape, dtype=bool)
+                        for label_column in label_columns:
+                            labels = arrays[label_column["key"]]
+                            if exact:
+                                labelled |= np.fromiter((matches(label) for label in labels.tolist()), bool, labels.size)
+                            else:
+                                labelled |= np.char.find(np.char.lower(labels), needle) >= 0
+                        mask &= labelled
+                    if date_array is not None:
+                        if since_ts is not None:
+                            mask &= date_array >= since_ts
+                        if until_ts is not None:
+                            mask &= date_array <= until_ts
+                    rows = np.nonzero(mask)[0]
+                    if not rows.size:
+                        continue
+                    values.append(array[rows])
+                    dates.append(date_array[rows] if date_array is not None else np.full(rows.size, np.datetime64("NaT", "s")))
+                    sources.append((index, table, target["name"], rows))
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    result: Dict[str, Any] = {"measure": measure, "agg": agg, "since": since, "until": until}
+    if not values:
+        return {**result, "value": None, "count": 0, "matches": [], "elapsed_ms": elapsed_ms}
+
+    all_values = np.concatenate(values)
+    all_dates = np.concatenate(dates)
+    origin = np.concatenate([np.full(rows.size, idx) for idx, (_, _, _, rows) in enumerate(sources)])
+    row_numbers = np.concatenate([rows for _, _, _, rows in sources])
+
+    if agg in {"latest", "earliest"}:
+        dated = np.nonzero(~np.isnat(all_dates))[0]
+        candidates = dated if dated.size else np.arange(all_values.size)
+        order = candidates[np.argsort(all_dates[candidates], kind="stable")]
+        order = order[::-1] if agg == "latest" else order
+        value = float(all_values[order[0]])
+    elif agg == "min":
+        order = np.argsort(all_values, kind="stable")
+        value = float(all_values[order[0]])
+    elif agg == "max":
+        order = np.argsort(all_values, kind="stable")[::-1]
+        value = float(all_values[order[0]])
+    else:
+        order = np.arange(all_values.size)
+        value = {
+            "mean": float(all_values.mean()),
+            "sum": float(all_values.sum()),
+            "count": float(all_values.size),
+        }[agg]
+
+    matches = []
+    for position in order[:limit].tolist():
+        index, table, column, _ = sources[origin[position]]
+        date = all_dates[position]
+        matches.append(
+            {
+                "doc_id": index["doc_id"],
+                "chunk_id": table.get("chunk_id"),
+                "table": table["table"],
+                "column": column,
+                "row": int(row_numbers[position]),
+                "value": float(all_values[position]),
+                "date": None if np.isnat(date) else str(date.astype("datetime64[D]")),
+            }
+        )
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    return {**result, "value": value, "count": int(all_values.size), "matches": matches, "elapsed_ms": elapsed_ms}
+
+
+AGG_WORDS = {
+    "max": "max",
+    "maximum": "max",
+    "highest": "max",
+    "peak": "max",
+    "min": "min",
+    "minimum": "min",
+    "lowest": "min",
+    "average": "mean",
+    "avg": "mean",
+    "mean": "mean",
+    "sum": "sum",
+    "latest": "latest",
+    "last": "latest",
+    "recent": "latest",
+    "earliest": "earliest",
+    "count": "count",
+}
+STOP_WORDS = {
+    "what", "was", "is", "the", "a", "an", "of", "for", "in", "my", "patient", "patients", "patient's",
+    "value", "values", "level", "levels", "result", "results", "reading", "readings", "most", "how",
+    "many", "show", "me", "give", "his", "her", "their", "on", "record", "recorded", "measured",
+}
+
+
+def _time_range(text: str, now: datetime) -> Tuple[Optional[str], Optional[str], str]:
+    match = re.search(r"\bthis year\b", text)
+    if match:
+        return f"{now.year}-01-01", None, text.replace(match.group(0), " ")
+    match = re.search(r"\blast year\b", text)
+    if match:
+        return f"{now.year - 1}-01-01", f"{now.year - 1}-12-31", text.replace(match.group(0), " ")
+    match = re.search(r"\b(?:in|during) (\d{4})\b", text)
+    if match:
+        year = match.group(1)
+        return f"{year}-01-01", f"{year}-12-31", text.replace(match.group(0), " ")
+    match = re.search(r"\b(?:in the )?(?:last|past) (\d+) (day|week|month|year)s?\b", text)
+    if match:
+        days = int(match.group(1)) * {"day": 1, "week": 7, "month": 30, "year": 365}[match.group(2)]
+        return (now - timedelta(days=days)).date().isoformat(), None, text.replace(match.group(0), " ")
+    match = re.search(r"\bsince (\d{4}-\d{2}-\d{2})\b", text)
+    if match:
+        return match.group(1), None, text.replace(match.group(0), " ")
+    return None, None, text
+
+
+def parse_question(question: str, now: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+    text = re.sub(r"[^a-z0-9\-' ]+", " ", question.lower())
+    since, until, text = _time_range(text, now or datetime.utcnow())
+    words = text.split()
+    agg = None
+    if "how" in words and "many" in words:
+        agg = "count"
+    for word in words:
+        if word in AGG_WORDS:
+            agg = agg or AGG_WORDS[word]
+    if agg is None:
+        return None
+    measure = " ".join(word for word in words if word not in AGG_WORDS and word not in STOP_WORDS)
+    if not measure:
+        return None
+    return {"measure": measure, "agg": agg, "since": since, "until": until}
+
+
+def answer_question(question: str, doc_ids: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+    parsed = parse_question(question)
+    if not parsed or not known_measure(parsed["measure"], doc_ids, exact=True):
+        return None
+    try:
+        result = query_values(doc_ids=doc_ids, exact=True, **parsed)
+    except ValueError:
+        return None
+    return result if result["count"] else None
+
+
+def format_result(result: Dict[str, Any]) -> str:
+    measure = result["measure"]
+    if result["agg"] == "count":
+        return f"Found {result['count']} {measure} value(s)."
+    if result["agg"] in {"mean", "sum"}:
+        label = "Average" if result["agg"] == "mean" else "Total"
+        return f"{label} {measure}: {result['value']:g} across {result['count']} value(s)."
+    labels = {"max": "Highest", "min": "Lowest", "latest": "Latest", "earliest": "Earliest"}
+    text = f"{labels[result['agg']]} {measure}: {result['value']:g}"
+    top = result["matches"][0] if result["matches"] else {}
+    if top.get("date"):
+        text += f" on {top['date']}"
+    return text + "."
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import csv
+import io
 import re
 from pathlib import Path
 from typing import List
@@ -7,6 +9,14 @@ from typing import List
 from .config import CHUNK_OVERLAP, CHUNK_SIZE
 
 
+DEFAULT_SHARD = "default"
+SHARD_RE = re.compile(r"[A-Za-z0-9](?:[A-Za-z0-9_-]{0,126}[A-Za-z0-9])?")
+
+
+class InvalidShard(ValueError):
+    pass
+
+
 def clean_text(text: str) -> str:
     text = text.replace("\u00a0", " ")
     text = re.sub(r"\s+", " ", text)
@@ -32,3 +42,20 @@ def chunk_text(text: str) -> List[str]:
 def safe_filename(name: str) -> str:
     cleaned = re.sub(r"[^a-zA-Z0-9._-]+", "_", name)
     return cleaned or "file"
+
+
+def table_rows(text: str) -> List[List[str]]:
+    rows = [row for row in csv.reader(io.StringIO(text), delimiter="\t") if any(cell.strip() for cell in row)]
+    width = max((len(row) for row in rows), default=0)
+    return [row + [""] * (width - len(row)) for row in rows]
+
+
+def normalize_shard(shard: str | None) -> str:
+    if not shard:
+        return DEFAULT_SHARD
+    if not SHARD_RE.fullmatch(shard):
+        raise InvalidShard(
+            f"Invalid shard id {shard!r}: use 1-128 letters, digits, '-' or '_', "
+            "starting and ending with a letter or digit"
+        )
+    return shard
@@ -1,12 +1,31 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import chromadb
+import numpy as np
 from chromadb.config import Settings
 
 from .config import CHROMA_DIR
 from .llm import EmbeddingClient
+from .utils import DEFAULT_SHARD, normalize_shard
+
+
+COLLECTION_PREFIX = "medical_docs"
+
+_fanout = ThreadPoolExecutor(max_workers=8, thread_name_prefix="shard-query")
+
+
+def collection_name(shard: str | None) -> str:
+    shard = normalize_shard(shard)
+    if shard == DEFAULT_SHARD:
+        return COLLECTION_PREFIX
+    return f"{COLLECTION_PREFIX}__{shard}"
+
+
+def _empty(count: int) -> List[Dict[str, Any]]:
+    return [{"documents": [[]], "metadatas": [[]], "ids": [[]], "distances": [[]]} for _ in range(count)]
 
 
 class VectorStore:
@@ -15,29 +34,175 @@ class VectorStore:
             path=str(CHROMA_DIR),
             settings=Settings(anonymized_telemetry=False),
         )
-        self._collection = self._client.get_or_create_collection("medical_docs")
+        self._collections: Dict[str, Any] = {}
         self._embedder = EmbeddingClient()
 
-    def add_chunks(self, chunks: List[str], metadatas: List[Dict[str, Any]], ids: List[str]) -> None:
+    def _collection(self, shard: str | None, create: bool = True):
+        shard = normalize_shard(shard)
+        if shard not in self._collections:
+            name = collection_name(shard)
+            if create:
+                self._collections[shard] = self._client.get_or_create_collection(name, metadata={"shard": shard})
+            else:
+                try:
+                    self._collections[shard] = self._client.get_collection(name)
+                except Exception:
+                    return None
+        return self._collections[shard]
+
+    def shards(self) -> List[str]:
+        shards = []
+        for collection in self._client.list_collections():
+            name = collection if isinstance(collection, str) else collection.name
+            if name == COLLECTION_PREFIX:
+                shards.append(DEFAULT_SHARD)
+            elif name.startswith(f"{COLLECTION_PREFIX}__"):
+                shards.append(name[len(COLLECTION_PREFIX) + 2 :])
+        return shards
+
+    def shard_counts(self) -> Dict[str, int]:
+        counts = {}
+        for shard in self.shards():
+            collection = self._collection(shard, create=False)
+            if collection is not None:
+                counts[shard] = collection.count()
+        return counts
+
+    def add_chunks(
+        self,
+        chunks: List[str],
+        metadatas: List[Dict[str, Any]],
+        ids: List[str],
+        shard: str | None = None,
+    ) -> None:
         if not chunks:
             return
         embeddings = self._embedder.embed(chunks)
-        self._collection.add(documents=chunks, metadatas=metadatas, ids=ids, embeddings=embeddings)
+        self._collection(shard).add(documents=chunks, metadatas=metadatas, ids=ids, embeddings=embeddings)
+
+    def add_records(
+        self,
+        shard: str | None,
+        ids: List[str],
+        embeddings: np.ndarray,
+        documents: List[str],
+        metadatas: List[Dict[str, Any]],
+    ) -> None:
+        if ids:
+            self._collection(shard).upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
 
-    def delete_doc(self, doc_id: str) -> None:
-        if self._collection.count() == 0:
+    def iter_records(
+        self, shard: str | None, batch_size: int
+    ) -> Iterator[Tuple[List[str], np.ndarray, List[str], List[Dict[str, Any]]]]:
+        collection = self._collection(shard, create=False)
+        if collection is None:
             return
-        self._collection.delete(where={"doc_id": doc_id})
+        offset = 0
+        while True:
+            page = collection.get(
+                limit=batch_size,
+                offset=offset,
+                include=["embeddings", "documents", "metadatas"],
+            )
+            ids = page["ids"]
+            if not ids:
+                return
+            embeddings = np.asarray(page["embeddings"], dtype="<f4")
+            yield ids, embeddings, page["documents"], [meta or {} for meta in page["metadatas"]]
+            offset += len(ids)
 
-    def reset(self) -> None:
+    def max_batch_size(self) -> int:
         try:
-            self._client.delete_collection("medical_docs")
+            return self._client.get_max_batch_size()
         except Exception:
-            pass
-        self._collection = self._client.get_or_create_collection("medical_docs")
+            return 1000
 
-    def query(self, text: str, top_k: int) -> Dict[str, Any]:
-        if self._collection.count() == 0:
-            return {"documents": [[]], "metadatas": [[]], "ids": [[]]}
+    def delete_doc(self, doc_id: str, shard: str | None = None) -> None:
+        shards = [shard] if shard else self.shards()
+        for name in shards:
+            collection = self._collection(name, create=False)
+            if collection is None or collection.count() == 0:
+                continue
+            collection.delete(where={"doc_id": doc_id})
+
+    def drop_shard(self, shard: str) -> bool:
+        shard = normalize_shard(shard)
+        self._collections.pop(shard, None)
+        try:
+            self._client.delete_collection(collection_name(shard))
+        except Exception:
+            return False
+        return True
+
+    def reset(self) -> None:
+        for shard in self.shards():
+            self.drop_shard(shard)
+        self._collection(DEFAULT_SHARD)
+
+    def _targets(self, shards: Optional[List[str]]) -> List[Any]:
+        names = [normalize_shard(shard) for shard in shards] if shards else self.shards()
+        collections = [self._collection(name, create=False) for name in dict.fromkeys(names)]
+        return [collection for collection in collections if collection is not None and collection.count() > 0]
+
+    def _search(
+        self,
+        targets: List[Any],
+        embeddings: List[List[float]],
+        top_k: int,
+        where: Optional[Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
+        def run(collection):
+            return collection.query(query_embeddings=embeddings, n_results=top_k, where=where)
+
+        if len(targets) == 1:
+            partials = [run(targets[0])]
+        else:
+            partials = list(_fanout.map(run, targets))
+
+        merged = []
+        for idx in range(len(embeddings)):
+            hits = []
+            for partial in partials:
+                distances = (partial.get("distances") or [[]])[idx] or [0.0] * len(partial["ids"][idx])
+                hits.extend(
+                    zip(distances, partial["ids"][idx], partial["documents"][idx], partial["metadatas"][idx])
+                )
+            hits.sort(key=lambda hit: hit[0])
+            hits = hits[:top_k]
+            merged.append(
+                {
+                    "documents": [[hit[2] for hit in hits]],
+                    "metadatas": [[hit[3] for hit in hits]],
+                    "ids": [[hit[1] for hit in hits]],
+                    "distances": [[hit[0] for hit in hits]],
+                }
+            )
+        return merged
+
+    def query(
+        self,
+        text: str,
+        top_k: int,
+        where: Optional[Dict[str, Any]] = None,
+        shards: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        targets = self._targets(shards)
+        if not targets:
+            return _empty(1)[0]
         embedding = self._embedder.embed([text])[0]
-        return self._collection.query(query_embeddings=[embedding], n_results=top_k)
+        return self._search(targets, [embedding], top_k, where)[0]
+
+    def query_many(
+        self,
+        texts: List[str],
+        top_k: int,
+        where: Optional[Dict[str, Any]] = None,
+        shards: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        if not texts:
+            return []
+        targets = self._targets(shards)
+        if not targets:
+            return _empty(len(texts))
+        embeddings = self._embedder.embed(texts)
+        return self._search(targets, embeddings, top_k, where)
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import argparse
+import random
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Iterator, List, Tuple, Type
+
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import Flowable, LayoutError, Paragraph, SimpleDocTemplate, Spacer
+
+from backend.app.report import StreamingDocTemplate, table_flowables
+
+
+def _synthetic_table(rows: int, cols: int) -> str:
+    header = "\t".join(["Date", "Test"] + [f"Value {idx}" for idx in range(cols - 2)])
+    lines = [header]
+    for row in range(rows):
+        values = [f"{random.uniform(0, 200):.2f}" for _ in range(cols - 2)]
+        lines.append("\t".join([f"2024-01-{row % 28 + 1:02d}", random.choice(["Creatinine", "HbA1c", "ALT"])] + values))
+    return "\n".join(lines)
+
+
+def _legacy(path: Path, tables: List[str]) -> None:
+    styles = getSampleStyleSheet()
+    story = []
+    for table in tables:
+        story.append(Paragraph("<pre>%s</pre>" % table, styles["Code"]))
+        story.append(Spacer(1, 12))
+    SimpleDocTemplate(str(path), pagesize=letter).build(story)
+
+
+def _streaming(path: Path, tables: List[str]) -> None:
+    styles = getSampleStyleSheet()
+    doc = StreamingDocTemplate(str(path), pagesize=letter, pageCompression=1)
+
+    def flowables() -> Iterator[Flowable]:
+        for table in tables:
+            yield from table_flowables(table, styles, doc.width)
+
+    doc.build_stream(flowables())
+
+
+def _measure(
+    name: str,
+    render: Callable[[Path, List[str]], None],
+    tables: List[str],
+    expected_errors: Tuple[Type[Exception], ...] = (),
+) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / f"{name}.pdf"
+        tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            render(path, tables)
+            status = f"{path.stat().st_size / 1024:.0f} KiB"
+        except expected_errors as exc:
+            status = f"failed: {type(exc).__name__}"
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    print(f"{name:<10}{elapsed:>10.2f} s{peak / 2**20:>12.1f} MiB   {status}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare legacy <pre> tables with paginated Table flowables.")
+    parser.add_argument("--tables", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--cols", type=int, default=6)
+    args = parser.parse_args()
+
+    random.seed(0)
+    tables = [_synthetic_table(args.rows, args.cols) for _ in range(args.tables)]
+    print(f"{'renderer':<10}{'time':>12}{'peak mem':>16}   output")
+    _measure("legacy", _legacy, tables, expected_errors=(LayoutError,))
+    _measure("streaming", _streaming, tables)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from typing import Dict, List
+
+from backend.app.config import RERANK_CANDIDATES, TOP_K
+from backend.app.llm import LLMClient
+from backend.app.rerank import retrieve
+from backend.app.vectorstore import VectorStore
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _run(queries: List[str], vectorstore: VectorStore, llm: LLMClient | None, top_k: int, rerank: bool) -> Dict[str, float]:
+    total_ms: List[float] = []
+    rerank_ms: List[float] = []
+    llm_ms: List[float] = []
+    prompt_chars: List[int] = []
+    for query in queries:
+        started = time.perf_counter()
+        results = retrieve(query, vectorstore, top_k, rerank=rerank)
+        total_ms.append((time.perf_counter() - started) * 1000)
+        rerank_ms.append(results.get("rerank_ms", 0.0))
+        context = "\n\n".join(results.get("documents", [[]])[0])
+        prompt_chars.append(len(context))
+        if llm is not None and context:
+            started = time.perf_counter()
+            llm.answer_with_context(query, context)
+            llm_ms.append((time.perf_counter() - started) * 1000)
+    return {
+        "retrieval_p50_ms": statistics.median(total_ms),
+        "retrieval_p95_ms": _percentile(total_ms, 95),
+        "rerank_p50_ms": statistics.median(rerank_ms),
+        "rerank_p95_ms": _percentile(rerank_ms, 95),
+        "prompt_tokens_avg": statistics.mean(prompt_chars) / 4,
+        "llm_p50_ms": statistics.median(llm_ms) if llm_ms else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare plain top-k retrieval with cross-encoder reranking.")
+    parser.add_argument("queries", nargs="+", help="Questions to run against the current index.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--llm", action="store_true", help="Also time answer_with_context for each query.")
+    args = parser.parse_args()
+
+    vectorstore = VectorStore()
+    llm = LLMClient() if args.llm else None
+    if llm is not None and not llm.available():
+        llm = None
+    queries = args.queries * args.repeat
+
+    # Warm the embedding and cross-encoder models so load time is not counted.
+    retrieve(queries[0], vectorstore, TOP_K, rerank=True)
+
+    rows = {
+        f"top{TOP_K}": _run(queries, vectorstore, llm, TOP_K, rerank=False),
+        f"top{RERANK_CANDIDATES}": _run(queries, vectorstore, llm, RERANK_CANDIDATES, rerank=False),
+        f"rerank{RERANK_CANDIDATES}->top{TOP_K}": _run(queries, vectorstore, llm, TOP_K, rerank=True),
+    }
+    columns = list(next(iter(rows.values())).keys())
+    print("mode".ljust(24) + "".join(column.rjust(20) for column in columns))
+    for mode, stats in rows.items():
+        print(mode.ljust(24) + "".join(f"{stats[column]:20.1f}" for column in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def _send(self, status: int, payload: dict, headers: dict | None = None) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length", "0"))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.endswith("/chat/completions"):
+            self._send(404, {"error": {"message": "not found"}})
+            return
+
+        time.sleep(self.server.latency)
+        roll = random.random()
+        if roll < self.server.rate_limit_rate:
+            self._send(429, {"error": {"message": "rate limited"}}, {"retry-after-ms": "200"})
+            return
+        if roll < self.server.rate_limit_rate + self.server.error_rate:
+            self._send(503, {"error": {"message": "unavailable"}})
+            return
+
+        message: dict = {"role": "assistant", "content": "fake answer"}
+        if request.get("tools"):
+            name = request["tools"][0]["function"]["name"]
+            section = request["messages"][-1]["content"].rsplit(":", 1)[-1].strip()
+            message = {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [
+                    {
+                        "id": uuid.uuid4().hex,
+                        "type": "function",
+                        "function": {"name": name, "arguments": json.dumps({"section": section})},
+                    }
+                ],
+            }
+        self._send(
+            200,
+            {
+                "id": uuid.uuid4().hex,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "fake"),
+                "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            },
+        )
+
+
+def make_server(
+    port: int = 8900,
+    latency: float = 0.0,
+    error_rate: float = 0.0,
+    rate_limit_rate: float = 0.0,
+) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeOpenAIHandler)
+    server.latency = latency
+    server.error_rate = error_rate
+    server.rate_limit_rate = rate_limit_rate
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Minimal OpenAI-compatible chat completions server for local testing.")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to sleep before answering.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503.")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429.")
+    args = parser.parse_args()
+
+    server = make_server(args.port, args.latency, args.error_rate, args.rate_limit_rate)
+    print(f"Fake LLM server on http://127.0.0.1:{server.server_port}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import Dict, List
+
+import httpx
+
+
+WORDS = "patient admitted with chest pain creatinine hba1c glucose stable discharged follow up cardiology".split()
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _synthetic_doc(size: int) -> bytes:
+    return " ".join(random.choice(WORDS) for _ in range(size)).encode("utf-8")
+
+
+async def _chat_phase(client: httpx.AsyncClient, questions: List[str], requests: int, concurrency: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    rejected = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(idx: int) -> None:
+        nonlocal rejected
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post("/chat", json={"message": questions[idx % len(questions)]})
+            if response.status_code == 429:
+                rejected += 1
+                return
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(*(one(idx) for idx in range(requests)))
+    return {
+        "ok": len(latencies),
+        "429": rejected,
+        "p50_ms": statistics.median(latencies) if latencies else 0.0,
+        "p99_ms": _percentile(latencies, 99),
+    }
+
+
+async def _bulk_ingest(client: httpx.AsyncClient, stop: asyncio.Event, uploaders: int, files: int, words: int) -> Dict[str, int]:
+    counts = {"uploads": 0, "429": 0}
+
+    async def uploader() -> None:
+        while not stop.is_set():
+            payload = [("files", (f"bulk_{random.randrange(10**9)}.txt", _synthetic_doc(words), "text/plain")) for _ in range(files)]
+            response = await client.post("/upload", files=payload)
+            if response.status_code == 429:
+                counts["429"] += 1
+                await asyncio.sleep(float(response.headers.get("Retry-After", "1")))
+            else:
+                counts["uploads"] += 1
+
+    await asyncio.gather(*(uploader() for _ in range(uploaders)))
+    return counts
+
+
+async def run(args: argparse.Namespace) -> None:
+    questions = args.question or ["What is the latest creatinine?", "Summarize the discharge plan."]
+    async with httpx.AsyncClient(base_url=args.url, timeout=120) as client:
+        baseline = await _chat_phase(client, questions, args.requests, args.concurrency)
+
+        stop = asyncio.Event()
+        bulk = asyncio.create_task(_bulk_ingest(client, stop, args.uploaders, args.files, args.words))
+        await asyncio.sleep(args.warmup)
+        loaded = await _chat_phase(client, questions, args.requests, args.concurrency)
+        stop.set()
+        bulk_counts = await bulk
+
+    print(f"{'phase':<16}{'ok':>6}{'429':>6}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, stats in (("chat", baseline), ("chat+ingest", loaded)):
+        print(f"{name:<16}{stats['ok']:>6}{stats['429']:>6}{stats['p50_ms']:>10.0f}{stats['p99_ms']:>10.0f}")
+    print(f"bulk uploads completed: {bulk_counts['uploads']}, shed with 429: {bulk_counts['429']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure /chat latency with and without a concurrent bulk ingest.")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--question", action="append")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--uploaders", type=int, default=8)
+    parser.add_argument("--files", type=int, default=5, help="Files per upload request.")
+    parser.add_argument("--words", type=int, default=20000, help="Words per synthetic file.")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds of ingest before measuring.")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+from openai import OpenAI
+
+from backend.app import llm
+from backend.app.llm import LLMError, LLMPool, Provider
+from backend.app.scheduling import ProviderLimiter
+from backend.scripts.fake_llm_server import make_server
+
+
+MESSAGES = [{"role": "user", "content": "What is the latest HbA1c?"}]
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(llm, "LLM_MAX_RETRIES", 2)
+    monkeypatch.setattr(llm, "LLM_RETRY_BASE_DELAY", 0.01)
+    monkeypatch.setattr(llm, "LLM_RETRY_MAX_DELAY", 1.0)
+    monkeypatch.setattr(llm, "LLM_HEDGE_AFTER", 0)
+
+
+@pytest.fixture
+def fake_server():
+    servers = []
+
+    def start(**options) -> str:
+        server = make_server(port=0, **options)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}/v1"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def provider(name: str, base_url: str) -> Provider:
+    client = OpenAI(api_key="test", base_url=base_url, max_retries=0)
+    return Provider(name, client, "fake-model", ProviderLimiter(0, 0))
+
+
+def test_rate_limited_provider_retries_then_fails_over(fake_server):
+    pool = LLMPool(
+        [
+            provider("primary", fake_server(rate_limit_rate=1.0)),
+            provider("secondary", fake_server()),
+        ]
+    )
+
+    started = time.perf_counter()
+    response = pool.complete(messages=MESSAGES)
+    elapsed = time.perf_counter() - started
+
+    assert response.choices[0].message.content == "fake answer"
+    assert elapsed >= 0.4
+    metrics = pool.metrics_snapshot()
+    assert metrics["primary"]["requests"] == 3
+    assert metrics["primary"]["errors"] == 3
+    assert metrics["primary"]["retries"] == 2
+    assert metrics["secondary"]["requests"] == 1
+    assert metrics["secondary"]["errors"] == 0
+    assert metrics["secondary"]["failovers"] == 1
+
+
+def test_server_errors_are_retried_and_surface_as_llm_error(fake_server):
+    pool = LLMPool([provider("primary", fake_server(error_rate=1.0))])
+
+    with pytest.raises(LLMError):
+        pool.complete(messages=MESSAGES)
+
+    metrics = pool.metrics_snapshot()["primary"]
+    assert metrics["requests"] == 3
+    assert metrics["errors"] == 3
+    assert metrics["retries"] == 2